@@ -0,0 +1,64 @@
+'''
+Save/load times of a pickled corpus against the columnar CorpusStore.
+
+Builds a synthetic lean corpus of PageRecords and compares unpickling the
+whole reader with loading all records, and a single column, from the
+store. Run from the py-blaze directory:
+
+    python -m benchmarks.bench_corpus_io
+'''
+import os
+import random
+import tempfile
+import time
+import pandas as pd
+from blaze.scraping.corpus import CorpusReader
+from blaze.scraping.record import PageRecord
+
+WORDS = 'data model python feature train deploy cloud query index vector'.split()
+
+
+def make_corpus(n_pages, seed=0):
+    rng = random.Random(seed)
+    reader = CorpusReader([], verbose=False, lean=True)
+    reader.corpus = {}
+    for i in range(n_pages):
+        url = f'https://site{i % 500}.com/post/{i}'
+        reader.corpus[url] = PageRecord(
+            url=url,
+            resolved_url=url,
+            basedomain=f'https://site{i % 500}.com/',
+            status_code=200,
+            text=' '.join(rng.choice(WORDS) for _ in range(800)),
+            links={
+                'internal': [f'https://site{i % 500}.com/p/{j}' for j in range(40)],
+                'subdomain': [], 'rss': [], 'blog': [], 'email': [],
+                'external': [f'https://ext{j}.org/' for j in range(20)]},
+            timings={'fetch': 0.2, 'parse': 0.05},
+            fetched=True)
+    reader.corpus_urls = list(reader.corpus)
+    reader.timestamp = pd.Timestamp.now()
+    return reader
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f'  {label:<34} {time.perf_counter() - start:8.3f} s')
+    return result
+
+
+def bench(n_pages=20000):
+    reader = make_corpus(n_pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        pkl, store = os.path.join(tmp, 'corpus.pkl'), os.path.join(tmp, 'corpus')
+        print(f'{n_pages} pages')
+        timed('save pickle', lambda: reader.save(pkl))
+        timed('save columnar', lambda: reader.save(store, format='arrow'))
+        timed('load pickle', lambda: CorpusReader.load(pkl))
+        timed('load columnar, all columns', lambda: CorpusReader.load(store))
+        timed('load_columns resolved_url', lambda: CorpusReader.load_columns(store, ['resolved_url']))
+
+
+if __name__ == '__main__':
+    bench()
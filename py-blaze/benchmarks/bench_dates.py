@@ -0,0 +1,58 @@
+'''
+Feed date parsing: parse_dates against dateutil's parse(ignoretz=True)
+applied row by row, which FeedReader.feed_to_pd used before.
+
+The generated column mixes the formats seen in feeds, mostly RFC 822 and
+ISO 8601 with a few free-form dates, and both parsers must agree on every
+value. Run from the py-blaze directory:
+
+    python -m benchmarks.bench_dates
+'''
+import random
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from dateutil.parser import parse
+from blaze.utils.dates import parse_dates
+
+
+def make_dates(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1)
+    dates = []
+    for _ in range(n):
+        dt = start + timedelta(seconds=rng.randrange(10 * 365 * 24 * 3600))
+        kind = rng.random()
+        if kind < 0.6:
+            dates.append(dt.strftime('%a, %d %b %Y %H:%M:%S ') + rng.choice(['GMT', '+0000', '-0500', 'EST']))
+        elif kind < 0.95:
+            dates.append(dt.strftime('%Y-%m-%dT%H:%M:%S') + rng.choice(['Z', '+01:00', '.250Z', '']))
+        else:
+            dates.append(dt.strftime('%B %d, %Y'))
+    return pd.Series(dates)
+
+
+def baseline(values):
+    def convert(date_string):
+        try:
+            return parse(date_string, ignoretz=True)
+        except ValueError:
+            return None
+    return values.apply(convert)
+
+
+def bench(n=20_000, repeat=3):
+    values = make_dates(n)
+    for name, fn in [('dateutil per row', baseline), ('parse_dates', parse_dates)]:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn(values)
+            best = min(best, time.perf_counter() - start)
+        print(f'{name:>16}: {n / best:10.0f} dates/s')
+    mismatches = (pd.to_datetime(baseline(values)) != parse_dates(values)).sum()
+    print(f'{mismatches} of {n} dates differ')
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,45 @@
+'''
+Micro-benchmark for per-page link extraction (URLReader._find_links).
+
+Run from the py-blaze directory:
+
+    python -m benchmarks.bench_links
+'''
+import random
+import timeit
+from blaze.scraping.url import URLReader
+from blaze.scraping.parsers import parse_html
+
+HREFS = [
+    '/post/{i}', 'https://ext{j}.com/x/{i}', 'https://blog.example.com/p{i}',
+    'mailto:me{j}@example.com', '/blog/', '/feed/', 'https://medium.com/@user{j}',
+    '/tag/t{i}/feed/', 'www.other{j}.org/', '//cdn.example.net/{i}', 'rel/{i}',
+    '/', '/articles', '/news', 'https://example.com/about', 'index.xml',
+]
+
+
+def make_page(n_links, seed=0):
+    rng = random.Random(seed)
+    anchors = []
+    for i in range(n_links):
+        href = rng.choice(HREFS).format(i=i, j=i % 40)
+        anchors.append(f'<li><a href="{href}">link {i}</a></li>')
+    anchors.append('<a>Blog</a>')
+    return (
+        '<html><head><title>Bench</title>'
+        '<link rel="alternate" type="application/rss+xml" href="/index.xml">'
+        '<link rel="alternate" type="application/atom+xml" href="/atom.xml">'
+        '</head><body><ul>' + ''.join(anchors) + '</ul></body></html>')
+
+
+def bench(n_links, repeat=5):
+    page = URLReader('https://example.com/')
+    page.document = parse_html(make_page(n_links))
+    number = max(1, 2000 // n_links)
+    best = min(timeit.repeat(page._find_links, number=number, repeat=repeat)) / number
+    print(f'{n_links:>6} links: {best * 1000:8.2f} ms/page')
+
+
+if __name__ == '__main__':
+    for n in [50, 500, 5000]:
+        bench(n)
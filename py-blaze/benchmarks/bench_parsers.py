@@ -0,0 +1,55 @@
+'''
+Pages/sec and peak RSS of each HTML parser backend.
+
+Every backend parses the same generated corpus and runs link and text
+extraction on it, holding on to the parsed pages the way a CorpusReader
+does. Each backend runs in its own process so peak RSS is not shared.
+Run from the py-blaze directory:
+
+    python -m benchmarks.bench_parsers
+'''
+import resource
+import subprocess
+import sys
+import time
+from blaze.scraping.url import URLReader
+from blaze.scraping.parsers import parse_html
+from benchmarks.bench_text import make_page as make_text_page
+from benchmarks.bench_links import make_page as make_links_page
+
+BACKENDS = ['html.parser', 'lxml', 'selectolax']
+
+
+def make_corpus(n_pages):
+    # pages with long text and pages with many links, as bytes off the wire
+    return [
+        (make_text_page(100, seed=i) if i % 2 else make_links_page(500, seed=i)).encode('utf-8')
+        for i in range(n_pages)]
+
+
+def run(parser, n_pages=200):
+    corpus = make_corpus(n_pages)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pages = []
+    start = time.perf_counter()
+    for html in corpus:
+        page = URLReader('https://example.com/', parser=parser)
+        page.document = parse_html(html, parser)
+        page._find_links()
+        page._find_text()
+        pages.append(page)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    grown_mb = peak_mb - rss_before / 1024
+    print(
+        f'{parser:>12}: {n_pages / elapsed:8.1f} pages/s, '
+        f'peak RSS {peak_mb:7.1f} MB (+{grown_mb:.1f} MB for {n_pages} pages)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        for backend in BACKENDS:
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_parsers', backend], check=True)
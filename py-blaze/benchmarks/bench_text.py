@@ -0,0 +1,67 @@
+'''
+Throughput benchmark for page text extraction (URLReader._find_text).
+
+Runs over a fixed, generated corpus of blog-like pages with nested inline
+tags, so results are comparable between runs. Run from the py-blaze
+directory:
+
+    python -m benchmarks.bench_text
+'''
+import random
+import time
+from blaze.scraping.url import URLReader
+from blaze.scraping.parsers import parse_html
+
+WORDS = (
+    'data model python feature train deploy cloud query index vector latency '
+    'throughput cache memory – “quoted” café naïve © × • | // .'
+).split()
+
+
+def make_page(n_blocks, seed=0):
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    blocks = []
+    for i in range(n_blocks):
+        kind = i % 5
+        if kind == 0:
+            blocks.append(f'<h2>{sentence(5)}</h2>')
+        elif kind == 1:
+            blocks.append(
+                f'<p>{sentence(20)} <span>{sentence(4)}</span> '
+                f'<a href="/x">{sentence(3)}</a>\xa0{sentence(10)}</p>')
+        elif kind == 2:
+            blocks.append(f'<div><span>{sentence(6)} <span>{sentence(3)}</span></span></div>')
+        elif kind == 3:
+            blocks.append(f'<pre><code>{sentence(12)}\n\t{sentence(8)}</code></pre>')
+        else:
+            blocks.append(f'<p>{sentence(30)}<script>var x = 1;</script></p>')
+    return (
+        '<html><head><title>Bench page</title>'
+        '<meta name="description" content="A page for benchmarking text extraction">'
+        '</head><body>' + ''.join(blocks) + '</body></html>')
+
+
+def bench(n_pages=200, n_blocks=100, repeat=3):
+    pages = []
+    for i in range(n_pages):
+        page = URLReader('https://example.com/')
+        page.document = parse_html(make_page(n_blocks, seed=i))
+        pages.append(page)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            page._find_text()
+        best = min(best, time.perf_counter() - start)
+    chars = sum(len(page.text) for page in pages)
+    print(
+        f'{n_pages} pages x {n_blocks} blocks: {n_pages / best:8.1f} pages/s, '
+        f'{chars / n_pages:8.0f} chars of text/page')
+
+
+if __name__ == '__main__':
+    bench()
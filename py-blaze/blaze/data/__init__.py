@@ -1,2 +1,3 @@
 from .pinecone import *
-from .postgres import *
\ No newline at end of file
+from .postgres import *
+from .known import *
\ No newline at end of file
@@ -0,0 +1,167 @@
+'''Local index of urls already stored in the database.'''
+import hashlib
+import math
+import os
+import pickle
+from .postgres import _open_connection
+from ..utils.canonical import url_key
+
+# bumped whenever url_key changes, saved indexes with another version are rebuilt
+_KEY_VERSION = 2
+
+
+class BloomFilter:
+    '''
+    Fixed-size Bloom filter over strings.
+
+    Args:
+        capacity (int): Number of items the filter is sized for
+        error_rate (float): False-positive rate at capacity
+    '''
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing over one 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class KnownURLIndex:
+    '''
+    Urls (and resolved urls) already stored in a table, held locally so new
+    urls can be told apart without a database query per batch.
+
+    Urls are held by their canonical key (see url_key), so spelling
+    variants of a stored url count as known. Every key goes into a Bloom
+    filter and, by default, an exact set that answers lookups without false
+    positives. With exact=False only the filter is kept: a few MB per
+    million urls, at the cost of treating about error_rate of new urls as
+    known. The index is refreshed
+    incrementally from the table's dt_fetched column and can be saved to
+    disk between runs; a saved index with keys in an older format is
+    discarded and rebuilt by the next refresh.
+
+    Args:
+        path (str, optional): Pickle file the index is loaded from and saved to
+        table (str): Table with url, resolved_url and dt_fetched columns
+        capacity (int): Initial Bloom filter size, grown as urls are added
+            while the exact set is kept
+        error_rate (float): Bloom filter false-positive rate
+        exact (bool): Keep the exact set of urls
+    '''
+    def __init__(
+            self,
+            path=None,
+            table='blaze_content',
+            capacity=1_000_000,
+            error_rate=0.001,
+            exact=True):
+        self.path = path
+        self.table = table
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.urls = set() if exact else None
+        # newest dt_fetched seen, the next refresh only reads rows after it
+        self.last_fetched = None
+        self.key_version = _KEY_VERSION
+        if (path is not None) and os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f).__dict__
+            # keys in an older format would never match, the next refresh
+            # reads the whole table again instead
+            if state.get('key_version') == _KEY_VERSION:
+                # saved back where it was loaded from, even if the file was moved
+                state['path'] = path
+                self.__dict__.update(state)
+
+    def __contains__(self, url):
+        return self._has(url_key(url))
+
+    def _has(self, key):
+        # the filter rules out most new urls, the exact set confirms the rest
+        if key not in self.bloom:
+            return False
+        return (self.urls is None) or (key in self.urls)
+
+    def __len__(self):
+        return len(self.urls) if self.urls is not None else self.bloom.count
+
+    def add(self, urls):
+        for url in urls:
+            if not url:
+                continue
+            key = url_key(url)
+            if not self._has(key):
+                if self.urls is not None:
+                    self.urls.add(key)
+                self.bloom.add(key)
+        if (self.urls is not None) and (self.bloom.count > self.bloom.capacity):
+            self._grow()
+
+    def known(self, urls):
+        '''The urls that are in the index.'''
+        return [url for url in urls if url in self]
+
+    def filter_new(self, urls):
+        '''The urls that are not in the index, in their original order.'''
+        return [url for url in urls if url not in self]
+
+    def refresh(self, batch_size=50_000):
+        '''
+        Add the urls stored since the last refresh (all of them the first time).
+
+        Returns:
+            int: Number of rows read from the table
+        '''
+        conn = _open_connection()
+        # named (server-side) cursor, so a full build streams the table in batches
+        cur = conn.cursor(name='known_url_index')
+        query = f'SELECT url, resolved_url, dt_fetched FROM {self.table}'
+        if self.last_fetched is not None:
+            cur.execute(query + ' WHERE dt_fetched > %s', (self.last_fetched,))
+        else:
+            cur.execute(query)
+        n_rows = 0
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            n_rows += len(rows)
+            self.add(url for row in rows for url in row[:2])
+            newest = max((row[2] for row in rows if row[2] is not None), default=None)
+            if (newest is not None) and ((self.last_fetched is None) or (newest > self.last_fetched)):
+                self.last_fetched = newest
+        cur.close()
+        conn.close()
+        return n_rows
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, self.path)
+
+    def _grow(self):
+        # rebuild a filter with room for twice the urls from the exact set
+        self.bloom = BloomFilter(2 * max(self.bloom.capacity, len(self.urls)), self.error_rate)
+        for url in self.urls:
+            self.bloom.add(url)
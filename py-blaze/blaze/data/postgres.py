@@ -4,7 +4,9 @@ from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
 import pandas as pd
 from sqlalchemy import create_engine
 from datetime import timedelta
+import io
 from ..utils.tools import time_now
+from ..utils.canonical import url_key, url_variants
 import os
 
 pg_host = os.environ['PG_HOST']
@@ -13,6 +15,14 @@ pg_username = os.environ['PG_USERNAME']
 pg_password = os.environ['PG_PASSWORD']
 pg_dbname = os.environ['PG_DATABASE']
 
+# tables that need constraints pandas cannot create, by name
+_TABLE_DDL = {
+    # running in-degree per linked domain, so rankings need not rescan the edges
+    'blaze_sites_indegree': (
+        'CREATE TABLE IF NOT EXISTS blaze_sites_indegree ('
+        'domain TEXT PRIMARY KEY, in_degree BIGINT NOT NULL, dt_updated TIMESTAMP)'),
+    }
+
 class PG():
     def __init__(self):
         pass
@@ -28,6 +38,10 @@ class PG():
         cur.close()
         conn.close()
 
+    def create_table(self, table_name):
+        # no-op if the table exists
+        self.execute(_TABLE_DDL[table_name])
+
     def drop_table(self, table_name):
         conn = _open_connection()
         cur = conn.cursor()
@@ -46,6 +60,39 @@ class PG():
         df.to_sql(name=table_name, con=engine, if_exists='append', index=False)
         engine.dispose()
 
+    def copy_rows(self, table_name, df):
+        # bulk load with COPY, far faster than insert_df for large frames
+        conn = _open_connection()
+        cur = conn.cursor()
+        _copy_df(cur, table_name, df)
+        conn.commit()
+        cur.close()
+        conn.close()
+
+    def increment_counts(self, table_name, df, unique_columns, count_columns):
+        '''
+        Add the count columns of df onto the matching rows of table_name,
+        inserting rows for new keys; any other columns are overwritten.
+        table_name needs a unique constraint on unique_columns.
+        '''
+        conn = _open_connection()
+        cur = conn.cursor()
+        columns = df.columns.tolist()
+        temp_table = f"temp_{table_name}"
+        cur.execute(f"CREATE TEMP TABLE {temp_table} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+        _copy_df(cur, temp_table, df)
+        update_stmt = ", ".join(
+            [f"{col} = {table_name}.{col} + EXCLUDED.{col}" for col in count_columns] +
+            [f"{col} = EXCLUDED.{col}" for col in columns if col not in count_columns + unique_columns])
+        cur.execute(f"""
+            INSERT INTO {table_name} ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM {temp_table}
+            ON CONFLICT ({', '.join(unique_columns)}) DO UPDATE SET {update_stmt}
+        """)
+        conn.commit()
+        cur.close()
+        conn.close()
+
     def upsert_df(self, df, table_name, unique_columns):
         conn = _open_connection()
         # Create a cursor
@@ -201,6 +248,14 @@ def _open_connection():
     )
     return conn
 
+def _copy_df(cur, table_name, df):
+    # NaN/None are written as empty csv fields, which COPY reads as NULL
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY {table_name} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
 def _start_engine():
     engine = create_engine(
         f"postgresql://{pg_username}:{pg_password}@{pg_host}"
@@ -209,35 +264,33 @@ def _start_engine():
     return engine
 
 def url_in_table(url_list, table_name):
+    '''
+    The urls of url_list already in the table, matched on url or resolved_url
+    by their canonical key, so spelling variants of a stored page (http/https,
+    www, trailing slash, tracking parameters) count as stored.
+    '''
     # if url_list is a string, convert to list
     if isinstance(url_list, str):
         url_list = [url_list]
-    # double apostrophes in urls
-    url_list = [url.replace("'", "''") for url in url_list]
-    # combine urls into a single string
-    url_str = "'" + "','".join(url_list) + "'"
+    # look up every common spelling of each url
+    candidates = list({variant for url in url_list for variant in url_variants(url)})
     conn = _open_connection()
     cur = conn.cursor()
     # Define the SELECT statement
     select_query = f'''
-        SELECT distinct(url) 
+        SELECT url, resolved_url
         FROM {table_name}
-        WHERE url in ({url_str}) or resolved_url in ({url_str})
+        WHERE url = ANY(%s) or resolved_url = ANY(%s)
     '''
     # Execute the SELECT statement
-    cur.execute(select_query)
+    cur.execute(select_query, (candidates, candidates))
     # Retrieve the tables
     entries = cur.fetchall()
     # Close the cursor and the database connection
     cur.close()
     conn.close()
-    # if entries is empty return []
-    if len(entries) == 0:
-        entries = []
-    else:
-        # return a list of urls
-        entries = [e[0] for e in entries]
-    return entries
+    stored = {url_key(url) for row in entries for url in row if url}
+    return [url for url in url_list if url_key(url) in stored]
 
 
 def get_feed_list(last_checked, type, url=None):
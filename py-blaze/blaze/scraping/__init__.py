@@ -1,3 +1,11 @@
+from .domain import *
 from .url import *
 from .site import *
-from .corpus import *
\ No newline at end of file
+from .corpus import *
+from .cache import *
+from .health import *
+from .record import *
+from .store import *
+from .journal import *
+from .graph import *
+from .feeds import *
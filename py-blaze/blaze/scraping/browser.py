@@ -0,0 +1,199 @@
+'''A bounded pool of warm headless Chrome drivers.'''
+import atexit
+import contextlib
+import threading
+import time
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# number of resources the page has requested so far, and whether it has loaded
+_PAGE_STATE_JS = '''
+performance.setResourceTimingBufferSize(100000);
+return [document.readyState, performance.getEntriesByType('resource').length];
+'''
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pool_defaults = {'max_drivers': 4, 'max_uses': 50}
+
+
+class DriverPool:
+    '''
+    Leases warm Chrome drivers to callers, one page at a time.
+
+    At most `max_drivers` browsers are alive at once; callers block until a
+    driver is free. Drivers are reset between leases and quit after
+    `max_uses` pages, or straight away if a lease raised.
+
+    Args:
+        user_agent (str): User agent string the browsers are launched with
+        chrome_driver_path (str, optional): Path to Chrome driver executable
+        max_drivers (int): Maximum number of live browsers
+        max_uses (int): Number of pages a browser serves before it is recycled
+    '''
+    def __init__(self, user_agent, chrome_driver_path=None, max_drivers=4, max_uses=50):
+        self.user_agent = user_agent
+        self.chrome_driver_path = chrome_driver_path
+        self.max_drivers = max_drivers
+        self.max_uses = max_uses
+        self._idle = []
+        self._live = 0
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def lease(self):
+        driver, uses = self._acquire()
+        healthy = False
+        try:
+            yield driver
+            healthy = True
+        finally:
+            self._release(driver, uses + 1, healthy)
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._live -= len(idle)
+            self._cond.notify_all()
+        for driver, _ in idle:
+            _quit_driver(driver)
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._live < self.max_drivers:
+                    self._live += 1
+                    break
+                self._cond.wait()
+        # launch outside the lock, browser start-up takes seconds
+        try:
+            return _new_driver(self.user_agent, self.chrome_driver_path), 0
+        except Exception:
+            self._discard()
+            raise
+
+    def _release(self, driver, uses, healthy):
+        if healthy and (uses < self.max_uses) and _reset_driver(driver):
+            with self._cond:
+                self._idle.append((driver, uses))
+                self._cond.notify()
+            return
+        _quit_driver(driver)
+        self._discard()
+
+    def _discard(self):
+        with self._cond:
+            self._live -= 1
+            self._cond.notify()
+
+
+def configure_driver_pool(max_drivers=None, max_uses=None):
+    '''Set the size and recycling limit of the shared headless driver pools.'''
+    with _pools_lock:
+        if max_drivers is not None:
+            _pool_defaults['max_drivers'] = max_drivers
+        if max_uses is not None:
+            _pool_defaults['max_uses'] = max_uses
+        for pool in _pools.values():
+            pool.max_drivers = _pool_defaults['max_drivers']
+            pool.max_uses = _pool_defaults['max_uses']
+
+
+def _get_driver_pool(user_agent, chrome_driver_path=None):
+    key = (user_agent, chrome_driver_path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = DriverPool(user_agent, chrome_driver_path, **_pool_defaults)
+        return _pools[key]
+
+
+@atexit.register
+def _close_driver_pools():
+    for pool in list(_pools.values()):
+        pool.close()
+
+
+def _new_driver(user_agent, chrome_driver_path=None):
+    # Configure headless browser
+    options = Options()
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument("--disable-extensions")
+    options.add_argument('--headless')
+    options.add_argument("--incognito")
+    options.add_argument("--start-maximized")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument(f'user-agent={user_agent}')
+
+    if chrome_driver_path:
+        s = Service(executable_path=chrome_driver_path)
+    else:
+        s = Service()
+    return webdriver.Chrome(service=s, options=options)
+
+
+def _reset_driver(driver):
+    '''Clear cookies and storage left by the last page, return False if the browser is unusable.'''
+    try:
+        try:
+            driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        except Exception:
+            # storage is not accessible on some origins (e.g. about:blank, data:)
+            pass
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.get('about:blank')
+        return True
+    except Exception:
+        return False
+
+
+def _quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _wait_for_network_idle(driver, timeout, idle_time=0.5, poll_interval=0.1):
+    '''
+    Block until the document has loaded and no new resources have been
+    requested for `idle_time` seconds, or until `timeout` seconds pass.
+
+    Returns:
+        bool: True if the page went idle before the timeout
+    '''
+    deadline = time.time() + timeout
+    last_count = None
+    idle_since = time.time()
+    while time.time() < deadline:
+        state, count = driver.execute_script(_PAGE_STATE_JS)
+        now = time.time()
+        if (state != 'complete') or (count != last_count):
+            last_count = count
+            idle_since = now
+        elif (now - idle_since) >= idle_time:
+            return True
+        time.sleep(poll_interval)
+    return False
+
+
+def _scroll_to_bottom(driver, timeout, idle_time=0.5):
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    start_time = time.time()
+    while True:
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        # wait for lazy-loaded content triggered by the scroll to settle
+        remaining = timeout - (time.time() - start_time)
+        _wait_for_network_idle(driver, timeout=max(remaining, 0), idle_time=idle_time)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        # keep track of the time elapsed, if the time elapsed is greater than the timeout, exit
+        elapsed_time = time.time() - start_time
+        if (new_height == last_height) or (elapsed_time > timeout):
+            break
+        last_height = new_height
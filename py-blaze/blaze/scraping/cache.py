@@ -0,0 +1,149 @@
+'''On-disk HTTP conditional-GET cache.'''
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    '''
+    Stores the ETag / Last-Modified validators (and optionally the body) of
+    each fetched url in a sqlite file, so the next request for the url can
+    be made conditional and a 304 answered from disk.
+
+    The cache is bounded by the total size of the stored entries; the least
+    recently used urls are evicted first.
+
+    Args:
+        path (str): Location of the sqlite cache file
+        max_bytes (int): Maximum total size of the cached entries
+        store_content (bool): Keep response bodies, needed to re-parse pages
+            that come back 304. Feeds only need the validators.
+
+    Attributes:
+        hits (int): Requests answered with 304 Not Modified
+        misses (int): Requests that returned a full response
+    '''
+    def __init__(self, path='blaze_http_cache.sqlite', max_bytes=512 * 1024**2, store_content=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.store_content = store_content
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connect()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                resolved_url TEXT,
+                content BLOB,
+                size INTEGER,
+                accessed REAL
+            )
+            ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._conn.commit()
+
+    def headers(self, url):
+        '''Conditional request headers for a url, empty if it has not been cached.'''
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified FROM responses WHERE url = ?', (url,)).fetchone()
+        headers = {}
+        if row is not None:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def update(self, url, response):
+        '''
+        Record a response to a request made with `headers(url)`.
+
+        A 304 has its body replaced by the cached one (when stored) and counts
+        as a hit; any other response refreshes the stored validators.
+
+        Args:
+            url (str): The requested url
+            response (requests.Response or httpx.Response): The response received
+
+        Returns:
+            bool: True if the server answered 304 Not Modified
+        '''
+        if response.status_code == 304:
+            with self._lock:
+                self.hits += 1
+                row = self._conn.execute(
+                    'SELECT content FROM responses WHERE url = ?', (url,)).fetchone()
+                self._conn.execute(
+                    'UPDATE responses SET accessed = ? WHERE url = ?', (time.time(), url))
+                self._conn.commit()
+            response._content = row[0] if (row is not None) and (row[0] is not None) else b''
+            return True
+
+        with self._lock:
+            self.misses += 1
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if (response.status_code == 200) and (etag or last_modified):
+            self._store(url, etag, last_modified, str(response.url), response.content)
+        return False
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # pages and corpora that hold a cache can be pickled, the file is reopened on load
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_conn']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._connect()
+
+    def _store(self, url, etag, last_modified, resolved_url, content):
+        content = content if self.store_content else None
+        size = len(url) + len(content or b'')
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, resolved_url, content, size, time.time()))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # drop least recently used entries until the cache fits in max_bytes
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute('SELECT url, size FROM responses ORDER BY accessed')
+        evict = []
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((url,))
+            total -= size
+        self._conn.executemany('DELETE FROM responses WHERE url = ?', evict)
+        self.evictions += len(evict)
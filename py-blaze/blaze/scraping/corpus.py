@@ -1,8 +1,23 @@
+import os
 import random
 import pickle
 import time
+import asyncio
+import functools
+import itertools
+import queue
+import threading
 import pandas as pd
 from ..scraping.site import SiteParse
+from ..scraping.record import PageRecord, _as_record
+from ..scraping.store import CorpusStore
+from ..scraping.journal import CrawlJournal
+from ..scraping.graph import BacklinkGraph
+from ..utils.canonical import dedupe_urls
+from ..scraping.url import user_agent
+from ..scraping.fetch import _async_client
+from ..scraping.browser import configure_driver_pool
+from ..scraping.scheduler import HostScheduler, _interleave_by_host
 from ..data.postgres import url_in_table, PG
 import concurrent.futures
 
@@ -24,46 +39,278 @@ class CorpusReader():
         self.verbose = kwargs.get('verbose', True)
         self.headless = kwargs.get('headless', False)
         self.pause = kwargs.get('pause', 0)
+        # politeness is enforced per host: `pause` now spaces out requests to
+        # the same host, while requests to different hosts run concurrently
+        self.scheduler = HostScheduler(
+            rate=kwargs.get('host_rate', (1 / self.pause) if self.pause else None),
+            burst=kwargs.get('host_burst', 1),
+            max_in_flight=kwargs.get('host_concurrency', 2),
+            robots=kwargs.get('robots', False),
+            user_agent=user_agent)
+        # timeout is the total deadline per page, connect/read bound each network wait
+        self.timeout = kwargs.get('timeout', 60)
+        self.connect_timeout = kwargs.get('connect_timeout', 10)
+        self.read_timeout = kwargs.get('read_timeout', 30)
+        # optional HostHealth, hosts that keep failing are skipped for a cool-down
+        self.health = kwargs.get('health', None)
+        # 'threads' fetches with blocking requests, 'async' with pooled httpx
+        self.engine = kwargs.get('engine', 'threads')
+        # optional ResponseCache for conditional GETs
+        self.cache = kwargs.get('cache', None)
+        # pages are truncated after max_bytes, non-HTML/XML bodies are skipped
+        self.max_bytes = kwargs.get('max_bytes', 5 * 1024**2)
+        # HTML parser backend: 'html.parser', 'lxml' or 'selectolax'
+        self.parser = kwargs.get('parser', 'html.parser')
+        # number of processes that parse pages, None parses in the fetch workers
+        self.parse_workers = kwargs.get('parse_workers', None)
+        # keep compact PageRecords instead of full SiteParse objects
+        self.lean = kwargs.get('lean', False)
+        # cap on pages being read or waiting to be consumed by iter_read
+        self.max_in_flight = kwargs.get('max_in_flight', 4 * threads)
+        # completed pages are journaled to this file as the crawl goes;
+        # with resume, pages already journaled as fetched are not read again
+        self.journal = kwargs.get('journal', None)
+        self.resume = kwargs.get('resume', False)
+        # optional KnownURLIndex, urls already stored are not read at all
+        self.known = kwargs.get('known', None)
         # get datetime now
         self.timestamp = pd.to_datetime('now', format='%Y-%m-%d %H:%M:%S')
 
     def read(self):
         corpus = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.threads) as executor:
-            # Submit the tasks to the executor, creating a future object for each
-            future_to_url = {
-                executor.submit(
+        for url, page in self.iter_read():
+            corpus[url] = page
+
+        # Update the instance attributes once all pages have been read
+        self.corpus = corpus
+        self.corpus_urls = list(self.corpus.keys())
+        return self
+
+    def iter_read(self, max_in_flight=None):
+        '''
+        Read the urls, yielding (url, page) as each page completes.
+
+        At most max_in_flight pages are being fetched, parsed or waiting to
+        be consumed at any time, so a slow consumer holds up the readers
+        instead of pages piling up in memory. Unlike read(), the pages are
+        not collected into self.corpus.
+
+        With a journal, every completed page is appended to it as a
+        PageRecord. With resume, pages the journal holds as fetched are
+        yielded from it first and only the remaining urls are read; pages
+        that failed are tried again.
+
+        Args:
+            max_in_flight (int, optional): Defaults to the max_in_flight
+                kwarg of the reader, else 4 pages per thread
+        '''
+        max_in_flight = max_in_flight or self.max_in_flight
+        journal = None
+        # one read per page, however its url is spelled
+        unique_urls = url_list = dedupe_urls(self.url_list)
+        if self.known is not None:
+            url_list = self.known.filter_new(url_list)
+        if self.journal is not None:
+            journal = CrawlJournal(self.journal)
+            done = {}
+            if self.resume:
+                done = {url: r for url, r in journal.load().items() if r.fetched}
+                url_list = [url for url in url_list if url not in done]
+            for url in unique_urls:
+                if url in done:
+                    yield url, done[url]
+            # a crawl that does not resume starts a fresh journal
+            journal.open(truncate=not self.resume)
+        pool = None
+        if self.parse_workers:
+            # fetch workers hand the raw pages to these processes for parsing
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.parse_workers)
+            # start the processes before any fetch threads exist
+            list(pool.map(int, range(self.parse_workers)))
+        try:
+            # the headless browser can only be driven from the threaded engine
+            if (self.engine == 'async') and not self.headless:
+                pages = self._iter_async(url_list, pool, max_in_flight)
+            else:
+                if self.headless:
+                    # one warm browser per worker thread
+                    configure_driver_pool(max_drivers=self.threads)
+                pages = self._iter_threads(url_list, pool, max_in_flight)
+            for url, page in pages:
+                if self.verbose:
+                    print(f'Reading url: {url}')
+                if self.lean and (page is not None):
+                    # drop the response and parsed tree as soon as the page is done
+                    page = PageRecord.from_page(page)
+                if journal is not None:
+                    journal.append(url, _as_record(url, page))
+                yield url, page
+        finally:
+            if journal is not None:
+                journal.close()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            if self.health is not None:
+                self.health.save()
+
+    def _iter_threads(self, url_list, pool, max_in_flight):
+        # hosts are interleaved so workers are not all queued on one busy host
+        urls = iter(_interleave_by_host(url_list))
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads)
+        try:
+            future_to_url = {}
+            for url in itertools.islice(urls, max_in_flight):
+                future_to_url[executor.submit(self._read_page, url, pool)] = url
+            while future_to_url:
+                done, _ = concurrent.futures.wait(
+                    future_to_url, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    url = future_to_url.pop(future)
+                    try:
+                        # Returns the values from the 'read_page' function
+                        page_url, page = future.result()
+                    except Exception as exc:
+                        print(f'Reading {url} generated an exception: {exc}')
+                        page_url, page = url, None
+                    yield page_url, page
+                    # a page was consumed, start the next one
+                    for url in itertools.islice(urls, 1):
+                        future_to_url[executor.submit(self._read_page, url, pool)] = url
+        finally:
+            # on an early exit, pages not yet started are dropped
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _iter_async(self, url_list, pool, max_in_flight):
+        # the event loop runs in its own thread and hands finished pages over
+        # a queue; each page holds a slot until it has been consumed
+        pages = queue.Queue()
+        started = threading.Event()
+        state = {}
+
+        async def produce():
+            state['loop'] = asyncio.get_running_loop()
+            state['task'] = asyncio.current_task()
+            state['slots'] = asyncio.Semaphore(max_in_flight)
+            started.set()
+            await self._read_async(url_list, pages.put, state['slots'], pool)
+
+        def run():
+            try:
+                asyncio.run(produce())
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                # re-raised in the consuming thread
+                state['error'] = e
+            finally:
+                started.set()
+                pages.put(None)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        started.wait()
+        try:
+            while True:
+                item = pages.get()
+                if item is None:
+                    break
+                yield item
+                state['loop'].call_soon_threadsafe(state['slots'].release)
+        finally:
+            if thread.is_alive():
+                state['loop'].call_soon_threadsafe(state['task'].cancel)
+            thread.join()
+        if 'error' in state:
+            raise state['error']
+
+    def _read_page(self, url, pool=None):
+        self.scheduler.acquire(url)
+        try:
+            return read_page(
+                url,
+                blog_search=self.blog_search, 
+                about_search=self.about_search,
+                pause=0,
+                pool=pool,
+                **self._page_kwargs(),
+                )
+        finally:
+            self.scheduler.release(url)
+
+    def _page_kwargs(self):
+        return dict(
+            timeout=self.timeout,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            health=self.health,
+            parser=self.parser,
+            cache=self.cache,
+            max_bytes=self.max_bytes)
+
+    async def _read_async(self, url_list, emit, slots, pool=None):
+        loop = asyncio.get_running_loop()
+        # at most `threads` requests in flight; the client pools connections per host
+        semaphore = asyncio.Semaphore(self.threads)
+        # parsing (and any blog/about follow-ups) runs off the event loop
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads)
+
+        async def fetch_page(client, url):
+            page = SiteParse(url, **self._page_kwargs())
+            # wait for the host's turn before taking one of the global slots
+            await self.scheduler.acquire_async(url)
+            try:
+                async with semaphore:
+                    await page._request_async(client)
+            except Exception as e:
+                print(f'Error {e}: could not read url: {url}')
+                page.response = None
+                return url, page
+            finally:
+                self.scheduler.release(url)
+            return await loop.run_in_executor(
+                executor,
+                functools.partial(
                     read_page,
                     url,
-                    blog_search=self.blog_search, 
+                    blog_search=self.blog_search,
                     about_search=self.about_search,
-                    pause=self.pause,
-                    ): url for url in self.url_list}
+                    pause=0,
+                    page=page,
+                    pool=pool))
 
-            # As each task completes, update the status and store the result in the corpus
-            for _, future in enumerate(concurrent.futures.as_completed(future_to_url)):
-                url = future_to_url[future]
-                if self.verbose:
-                    print(f'Reading url: {url}')
-                try:
-                    page_url, page = future.result()  # Returns the values from the 'read_page' function
-                    corpus[page_url] = page
-                except Exception as exc:
-                    # Handle cases where the future raises an exception
-                    print(f'Reading {url} generated an exception: {exc}')
-                    corpus[page_url] = None
+        async def read_one(client, url):
+            emit(await fetch_page(client, url))
 
-        # Update the instance attributes once all threads have completed
-        self.corpus = corpus
-        self.corpus_urls = list(self.corpus.keys())
-        return self
+        try:
+            async with _async_client(
+                    user_agent,
+                    connect_timeout=min(self.connect_timeout, self.timeout),
+                    read_timeout=min(self.read_timeout, self.timeout),
+                    max_connections=self.threads) as client:
+                tasks = []
+                try:
+                    for url in _interleave_by_host(url_list):
+                        # released once the page has been consumed
+                        await slots.acquire()
+                        tasks.append(asyncio.create_task(read_one(client, url)))
+                    await asyncio.gather(*tasks)
+                finally:
+                    # stopped early: wind down pages in progress before the client closes
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
     def filter_new(self):
         urls_df = self.extract('resolved_url', as_df=True)
         urls_df.dropna(inplace=True)
         res_url_list = urls_df.resolved_url.tolist()
         res_url_list = [x for x in res_url_list if x is not None]
-        urls_existing = url_in_table(res_url_list, 'blaze_content')
+        if self.known is not None:
+            urls_existing = self.known.known(res_url_list)
+        else:
+            urls_existing = url_in_table(res_url_list, 'blaze_content')
         if len(urls_existing) > 0:
             pop_urls = urls_df[urls_df.resolved_url.isin(urls_existing)] \
                 .url.tolist()
@@ -71,13 +318,23 @@ class CorpusReader():
                 self.delete(url)
     
     def get_backlinks(self, write=False):
-        self.bcklnk_df = self.extract(get_backlinks_df, as_df=True) \
-            .rename(columns={'url': 'from_url'}) \
+        graph = BacklinkGraph()
+        for url, page in self.corpus.items():
+            if (page is not None) and page.fetched and (page.links is not None):
+                graph.add(url, page.resolved_url, page.links['external'])
+        self.backlinks = graph
+        self.bcklnk_df = graph.to_frame() \
             .assign(dt_added = lambda x: self.timestamp)
         if write:
             pg = PG()
-            pg.insert_df('blaze_sites_backlinks', self.bcklnk_df)
-            print(f'Wrote {self.bcklnk_df.shape[0]} backlinks to blaze_sites_backlinks')
+            pg.copy_rows('blaze_sites_backlinks', self.bcklnk_df)
+            pg.create_table('blaze_sites_indegree')
+            pg.increment_counts(
+                'blaze_sites_indegree',
+                graph.in_degree().assign(dt_updated = lambda x: self.timestamp),
+                unique_columns=['domain'],
+                count_columns=['in_degree'])
+            print(f'Wrote {len(graph)} backlinks to blaze_sites_backlinks')
     
     def count(self):
         return len(self.corpus)
@@ -133,18 +390,56 @@ class CorpusReader():
         self.corpus_urls = list(self.corpus.keys())
     
     # save to pickle file
-    def save(self, file_path):
-        with open(file_path, 'wb') as f:
-            pickle.dump(self, f)
+    def save(self, file_path, format='pickle', append=False):
+        '''
+        Save the corpus. By default the whole reader is pickled to file_path;
+        with format='arrow' file_path is a columnar CorpusStore directory
+        holding one row per page, to which the corpus is added as a new
+        batch file.
+
+        Args:
+            file_path (str): Pickle file or corpus directory
+            format (str): 'pickle' or 'arrow'
+            append (bool): Keep the batches already in the directory (arrow only)
+        '''
+        if format == 'pickle':
+            with open(file_path, 'wb') as f:
+                pickle.dump(self, f)
+            return
+        if format != 'arrow':
+            raise ValueError(f"format must be 'pickle' or 'arrow', not {format!r}")
+        store = CorpusStore(file_path)
+        old_parts = store.parts()
+        records = (_as_record(url, page) for url, page in self.corpus.items())
+        store.append(records, dt_fetched=self.timestamp)
+        # the old batches go only once the new one is written
+        if not append:
+            store.clear(old_parts)
     
     @classmethod
-    def load(cls, file_path):
-        with open(file_path, 'rb') as f:
-            loaded_object = pickle.load(f)
+    def load(cls, file_path, columns=None):
+        '''
+        Load a saved corpus. From a corpus directory (saved with
+        format='arrow') the pages come back as PageRecords, optionally with
+        only some of their columns.
+        '''
+        if not os.path.isdir(file_path):
+            with open(file_path, 'rb') as f:
+                loaded_object = pickle.load(f)
+            return loaded_object
+        records = CorpusStore(file_path).records(columns)
+        loaded_object = cls([r.url for r in records], verbose=False, lean=True)
+        loaded_object.corpus = {r.url: r for r in records}
+        loaded_object.corpus_urls = list(loaded_object.corpus.keys())
         return loaded_object
 
+    @staticmethod
+    def load_columns(file_path, columns, memory_map=True):
+        '''Read only the given columns of a corpus directory into a DataFrame, without building pages.'''
+        return CorpusStore(file_path).to_pandas(columns, memory_map=memory_map)
+
 def fetch_attr(url, corpus, attr, kwargs, nonestate=None):
-    if corpus[url].response is not None:
+    if (corpus[url] is not None) and corpus[url].fetched:
         if isinstance(attr, str):
             return url, getattr(corpus[url], attr)
         elif callable(attr):
@@ -152,11 +447,15 @@ def fetch_attr(url, corpus, attr, kwargs, nonestate=None):
     else:
         return url, nonestate
     
-def read_page(url, blog_search, about_search, pause, **kwargs): 
+def read_page(url, blog_search, about_search, pause, page=None, pool=None, **kwargs): 
     time.sleep(pause)
     try:
-        page = SiteParse(url, **kwargs)
-        page.read()
+        if page is None:
+            page = SiteParse(url, **kwargs)
+            page.read(pool=pool)
+        else:
+            # already fetched by the async engine, only parse it
+            page.read(response=page.response, pool=pool)
         if blog_search:
             page._blogs()
         if about_search:
@@ -166,15 +465,3 @@ def read_page(url, blog_search, about_search, pause, **kwargs):
         print(f'Error {e}: could not read url: {url}')
         page.response = None
         return url, page
-
-def get_backlinks_df(item):
-    lnks = item.links
-    lnks_external = None
-    if lnks is not None:
-        lnks_external = list(set(lnks['external']))
-        if len(lnks_external) == 0:
-            return None
-    bcklnk_df = pd.DataFrame({
-        'from_resolved': item.resolved_url,
-        'to_url': lnks_external})
-    return bcklnk_df
\ No newline at end of file
@@ -0,0 +1,74 @@
+'''Cached, offline domain parsing.'''
+import functools
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+import tldextract
+from tldextract.remote import lenient_netloc
+
+# parse against the public suffix list snapshot that ships with tldextract,
+# so workers never try to download the list at start-up
+_extractor = tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+# if medium, dev.to blog, or google site truncate to the base domain + path[1]
+_SITE_LIST = {
+    'medium.com': ['medium.com/about'],
+    'sites.google.com':[],
+    'dev.to':['dev.to/t/', 'dev.to/tags/', 'dev.to/about/', 'dev.to/terms', 'dev.to/privacy', 'dev.to/faq', 'dev.to/pod', 'dev.to/forem'],
+    }
+
+
+@functools.lru_cache(maxsize=2**16)
+def _extract_host(host):
+    return _extractor(host)
+
+
+def extract_domain(url):
+    '''
+    Split a url into subdomain, domain and suffix, like tldextract.extract.
+
+    Results are memoized per host in a bounded LRU cache, so repeated links
+    to the same site are only decomposed once.
+    '''
+    return _extract_host(lenient_netloc(url))
+
+
+@functools.lru_cache(maxsize=2**16)
+def get_basedomain(url):
+    try:
+        parsed_uri = urlparse(url)
+        result = f'{parsed_uri.scheme}://{parsed_uri.netloc}/'
+        # cycle through the site list and check if the url contains the site
+        for s, s_exclude in _SITE_LIST.items():
+            s_in_exclude = any([x in url for x in s_exclude])
+            if (s in parsed_uri.netloc) and not s_in_exclude:
+                if parsed_uri.path != '':
+                    result = result + parsed_uri.path.split('/')[1]
+                    break
+    except:
+        result = None
+    return result
+
+
+def _host(url):
+    return urlparse(url).netloc.lower()
+
+
+def basedomain(urls):
+    '''
+    Vectorized get_basedomain for a whole pandas column.
+
+    Each distinct url is parsed once and the results are broadcast back,
+    missing values map to None.
+
+    Args:
+        urls (pd.Series or list): urls to reduce to their base domain
+
+    Returns:
+        pd.Series: base domains, aligned with the input
+    '''
+    urls = pd.Series(urls)
+    codes, uniques = pd.factorize(urls)
+    # code -1 (missing) picks up the trailing None
+    parsed = np.array([get_basedomain(u) for u in uniques] + [None], dtype=object)
+    return pd.Series(parsed[codes], index=urls.index, name=urls.name)
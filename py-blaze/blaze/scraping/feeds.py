@@ -0,0 +1,351 @@
+'''Streaming feed parsing and per-feed state for incremental polling.'''
+import json
+import os
+import threading
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from urllib.parse import urljoin
+import feedparser
+from feedparser.mixin import _FeedParserMixin
+from feedparser.sanitizer import _sanitize_html
+from feedparser.urls import resolve_relative_uris
+import pandas as pd
+from ..utils.dates import parse_date
+
+_ATOM = '{http://www.w3.org/2005/Atom}'
+_RSS1 = '{http://purl.org/rss/1.0/}'
+_DC = '{http://purl.org/dc/elements/1.1/}'
+_CONTENT = '{http://purl.org/rss/1.0/modules/content/}'
+# RSS 2.0, Atom 1.0 and RSS 1.0 (RDF); anything else is left to feedparser
+_ROOT_TAGS = {'rss', _ATOM + 'feed', '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF'}
+_ENTRY_TAGS = {'item', _ATOM + 'entry', _RSS1 + 'item'}
+# entry child element -> field, named as feedparser names them
+_FIELDS = {
+    'title': 'title', _ATOM + 'title': 'title', _RSS1 + 'title': 'title',
+    'link': 'link', _RSS1 + 'link': 'link',
+    'author': 'author', _DC + 'creator': 'author',
+    'pubDate': 'published', _ATOM + 'published': 'published',
+    _ATOM + 'updated': 'updated', _DC + 'date': 'updated',
+    'description': 'summary', _ATOM + 'summary': 'summary', _RSS1 + 'description': 'summary',
+    _CONTENT + 'encoded': 'content', _ATOM + 'content': 'content',
+    'guid': 'id', _ATOM + 'id': 'id',
+    }
+# fields that can hold markup, sanitized like feedparser does
+_MARKUP_FIELDS = {'title', 'summary', 'content'}
+_XML_BASE = '{http://www.w3.org/XML/1998/namespace}base'
+_looks_like_html = _FeedParserMixin.looks_like_html
+_CHUNK_SIZE = 64 * 1024
+
+
+class _NotAFeed(Exception):
+    pass
+
+
+def parse_feed(content, max_entries=None, max_age=None, url=None):
+    '''
+    Parse an RSS or Atom feed, stopping once enough entries have been read.
+
+    The document is fed to an incremental XML parser in chunks and every
+    entry's subtree is dropped once its fields are read, so only the
+    entries kept are ever held in memory and parsing stops at the cap.
+    Malformed documents and other feed formats go to feedparser, with the
+    same caps applied to its entries. Use FeedStream to parse a document
+    while it is downloaded.
+
+    Args:
+        content (bytes): The feed document
+        max_entries (int, optional): Stop after this many entries
+        max_age (timedelta, optional): Skip entries older than this, and stop
+            at one once the dated entries read show the feed is newest first
+        url (str, optional): Where the feed was read from, relative links and
+            ids are resolved against it and any xml:base
+
+    Returns:
+        feedparser.FeedParserDict: With entries (title, link, author,
+            published, updated, summary and id where present) and bozo,
+            like feedparser.parse
+    '''
+    stream = FeedStream(max_entries=max_entries, max_age=max_age, url=url)
+    for start in range(0, len(content), _CHUNK_SIZE):
+        if stream.feed(content[start:start + _CHUNK_SIZE]):
+            break
+    return stream.result(content)
+
+
+class FeedStream:
+    '''
+    parse_feed for a document that arrives in chunks: each chunk is parsed
+    as it is fed, and feed() says when the caps are reached so the rest of
+    the document need not be downloaded.
+
+    Args:
+        max_entries, max_age, url: As for parse_feed
+    '''
+    def __init__(self, max_entries=None, max_age=None, url=None):
+        self.max_entries = max_entries
+        self.cutoff = (pd.Timestamp.now() - max_age) if max_age is not None else None
+        self.url = url
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        # elements still open, the innermost last, and their base urls
+        self._stack, self._bases = [], []
+        self.entries = []
+        # dated entries read so far, and whether they are newest first
+        self._previous, self._n_dated, self._ordered = None, 0, True
+        # set once the caps are reached, or once the document turns out to
+        # be for feedparser
+        self.done = False
+        self.failed = False
+
+    def feed(self, chunk):
+        '''Parse the next chunk of the document, True once no more are needed.'''
+        if self.done:
+            return True
+        if self.failed:
+            return False
+        try:
+            self._parser.feed(chunk)
+            self.done = self._read_events()
+        except (ET.ParseError, _NotAFeed):
+            # the whole document goes to feedparser in result()
+            self.failed = True
+        return self.done
+
+    def result(self, content):
+        '''
+        The parsed feed. content is the document read so far, the whole of it
+        unless feed() returned True.
+        '''
+        if self.done:
+            return _feed(self.entries, truncated=True)
+        if not self.failed:
+            try:
+                self._parser.close()
+                self._read_events()
+                return _feed(self.entries, truncated=False)
+            except (ET.ParseError, _NotAFeed):
+                pass
+        headers = {'content-location': self.url} if self.url is not None else None
+        feed = feedparser.parse(BytesIO(content), response_headers=headers)
+        entries = feed.entries
+        if self.cutoff is not None:
+            entries = [entry for entry in entries if not _older(entry, self.cutoff)]
+        if self.max_entries is not None:
+            entries = entries[:self.max_entries]
+        feed['entries'] = entries
+        return feed
+
+    def _read_events(self):
+        # True once the caps are reached
+        stack, bases, cutoff = self._stack, self._bases, self.cutoff
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if (not stack) and (element.tag not in _ROOT_TAGS):
+                    raise _NotAFeed(element.tag)
+                bases.append(_base(bases[-1] if bases else self.url, element))
+                stack.append(element)
+                continue
+            stack.pop()
+            base = bases.pop()
+            if element.tag not in _ENTRY_TAGS:
+                continue
+            entry = _entry(element, base)
+            # the feed is never held in full
+            if stack:
+                stack[-1].remove(element)
+            if cutoff is not None:
+                published = _published(entry)
+                if published is not None:
+                    if published < cutoff:
+                        # a pinned old post can come first, only stop once
+                        # the feed has shown itself to be newest first
+                        if self._ordered and (self._n_dated >= 2):
+                            return True
+                        continue
+                    self._ordered = self._ordered and (
+                        (self._previous is None) or (published <= self._previous))
+                    self._previous = published
+                    self._n_dated += 1
+            self.entries.append(entry)
+            if (self.max_entries is not None) and (len(self.entries) >= self.max_entries):
+                return True
+        return False
+
+
+def _base(base, element):
+    xml_base = element.get(_XML_BASE)
+    if xml_base is None:
+        return base
+    return urljoin(base, xml_base) if base is not None else xml_base
+
+
+def _published(entry):
+    return parse_date(entry.get('published') or entry.get('updated'))
+
+
+def _older(entry, cutoff):
+    published = _published(entry)
+    return (published is not None) and (published < cutoff)
+
+
+def _entry(element, base=None):
+    entry = feedparser.FeedParserDict()
+    for child in element:
+        tag = child.tag
+        if tag == _ATOM + 'link':
+            # the alternate link is the post itself
+            if (child.get('rel', 'alternate') == 'alternate') and ('link' not in entry):
+                entry['link'] = _resolve(_base(base, child), child.get('href'))
+            continue
+        if tag == _ATOM + 'author':
+            tag, child = 'author', child.find(_ATOM + 'name')
+            if child is None:
+                continue
+        field = _FIELDS.get(tag)
+        if (field is None) or (field in entry):
+            continue
+        if field in _MARKUP_FIELDS:
+            entry[field] = _markup(child, field, _base(base, child))
+            continue
+        entry[field] = ''.join(child.itertext()).strip()
+        if (field == 'link') or ((field == 'id') and (child.get('isPermaLink') != 'false')):
+            # ids are resolved like feedparser does, so both parsers give
+            # FeedState the same ids
+            entry[field] = _resolve(_base(base, child), entry[field])
+    if ('summary' not in entry) and ('content' in entry):
+        entry['summary'] = entry['content']
+    entry.pop('content', None)
+    return entry
+
+
+def _markup(child, field, base):
+    # text that may hold HTML, cleaned the way feedparser cleans it:
+    # relative urls resolved and scripts, styles and handlers removed
+    content_type = child.get('type', 'text') if child.tag.startswith(_ATOM) else None
+    if content_type in ('xhtml', 'application/xhtml+xml'):
+        text = _inner_xhtml(child)
+    else:
+        text = ''.join(child.itertext()).strip()
+    if content_type is None:
+        # rss descriptions are html, titles only when they look like it
+        html = (field != 'title') or _looks_like_html(text)
+    else:
+        html = content_type in ('html', 'text/html', 'xhtml', 'application/xhtml+xml')
+    if (not html) or (not text):
+        return text
+    if base is not None:
+        text = resolve_relative_uris(text, base, 'utf-8', 'text/html')
+    return _sanitize_html(text, 'utf-8', 'text/html')
+
+
+def _inner_xhtml(element):
+    # the markup inside an atom xhtml element, without its wrapping div
+    for node in element.iter():
+        if isinstance(node.tag, str):
+            node.tag = node.tag.rpartition('}')[2]
+    children = list(element)
+    if (len(children) == 1) and (children[0].tag == 'div') and not (element.text or '').strip():
+        element = children[0]
+    inner = (element.text or '') + ''.join(
+        ET.tostring(child, encoding='unicode') for child in element)
+    return inner.strip()
+
+
+def _resolve(base, link):
+    if (base is None) or (not link):
+        return link
+    return urljoin(base, link)
+
+
+def _feed(entries, truncated):
+    return feedparser.FeedParserDict(
+        entries=entries, feed=feedparser.FeedParserDict(), bozo=0, truncated=truncated)
+
+
+class FeedState:
+    '''
+    High-water marks of the feeds that have been read: the ids of the
+    entries seen and the newest published date seen in each feed, so a poll
+    only parses the entries it has not seen before, wherever they appear in
+    the feed. The state can be saved to a JSON file and is reloaded from it.
+
+    Marks recorded with update() are pending until commit(), so entries
+    read but not yet stored are offered again by the next poll.
+
+    Args:
+        path (str, optional): JSON file to load the state from and save it to
+        max_ids (int): Entry ids kept per feed beyond those in its latest read
+    '''
+    def __init__(self, path=None, max_ids=100):
+        self.path = path
+        self.max_ids = max_ids
+        # feed -> {'ids': [entry ids, latest read first], 'published': iso date or None}
+        self.feeds = {}
+        # the same, for reads not committed yet
+        self.pending = {}
+        self._lock = threading.Lock()
+        if (path is not None) and os.path.exists(path):
+            with open(path) as f:
+                self.feeds = json.load(f)
+
+    def new_entries(self, feed, entries):
+        '''The entries not seen in this feed before, in feed order.'''
+        with self._lock:
+            known = set(self.feeds.get(feed, {}).get('ids', []))
+        return [entry for entry in entries if _entry_id(entry) not in known]
+
+    def newest(self, feed):
+        '''The newest published date seen in this feed, or None.'''
+        with self._lock:
+            published = self.feeds.get(feed, {}).get('published')
+        return pd.Timestamp(published) if published is not None else None
+
+    def update(self, feed, entries, published=None):
+        '''
+        Record a read of the feed: every entry it listed and the newest
+        published date of the entries kept. Pending until commit().
+        '''
+        ids = [entry_id for entry_id in map(_entry_id, entries) if entry_id]
+        with self._lock:
+            self.pending[feed] = (ids, published)
+
+    def commit(self, feeds=None):
+        '''Make the pending marks of feeds (all if None) permanent and save.'''
+        with self._lock:
+            for feed in list(self.pending if feeds is None else feeds):
+                if feed not in self.pending:
+                    continue
+                ids, published = self.pending.pop(feed)
+                state = self.feeds.get(feed, {'ids': [], 'published': None})
+                # every id of the latest read is kept, so none of its entries come back
+                ids = list(dict.fromkeys(ids + state['ids']))[:max(self.max_ids, len(ids))]
+                if pd.notnull(published):
+                    published = pd.Timestamp(published)
+                    if (state['published'] is not None) and (pd.Timestamp(state['published']) > published):
+                        published = pd.Timestamp(state['published'])
+                    state['published'] = published.isoformat()
+                self.feeds[feed] = {'ids': ids, 'published': state['published']}
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            state = json.dumps(self.feeds)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(state)
+        os.replace(tmp_path, self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _entry_id(entry):
+    # feedparser maps the rss guid and the atom id to 'id'
+    return entry.get('id') or entry.get('link')
@@ -0,0 +1,134 @@
+'''Shared, connection-pooling HTTP clients for the scraping engines.'''
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import httpx
+
+# one requests.Session per worker thread, so keep-alive connections
+# (and their TLS sessions) are reused across pages instead of per page
+_local = threading.local()
+
+
+def _get_session(user_agent, pool_hosts=100, pool_size=10):
+    '''Return the keep-alive requests.Session owned by the calling thread.'''
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    session.headers.update({'User-Agent': user_agent})
+    return session
+
+
+def _async_client(user_agent, connect_timeout, read_timeout, max_connections=100):
+    '''
+    Create an httpx.AsyncClient for the async engine.
+
+    Connections are pooled and kept alive per origin, HTTP/2 is negotiated
+    where the server supports it and gzip/brotli bodies are decoded
+    transparently.
+
+    Args:
+        user_agent (str): User agent string to send with every request
+        connect_timeout (float): Seconds allowed to establish a connection
+        read_timeout (float): Seconds allowed between bytes received
+        max_connections (int): Maximum number of open connections across all hosts
+
+    Returns:
+        httpx.AsyncClient: client to be used as an async context manager
+    '''
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=30)
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        limits=limits,
+        headers={'User-Agent': user_agent})
+
+
+class UnsupportedContentType(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+# bodies with any other declared content type (pdf, video, images, ...) are not downloaded
+_TEXT_CONTENT_TYPES = ('html', 'xml', 'rss', 'atom', 'json', 'text/plain')
+
+
+def _check_content_type(response, url):
+    '''Raise UnsupportedContentType unless the response declares an HTML/XML-like body.'''
+    content_type = response.headers.get('Content-Type', '').lower()
+    if content_type and not any(t in content_type for t in _TEXT_CONTENT_TYPES):
+        raise UnsupportedContentType(f'{content_type} at {url}')
+
+
+def _read_capped(response, max_bytes, deadline=None, chunk_size=64 * 1024, on_chunk=None):
+    '''
+    Read a streamed requests.Response body, stopping once max_bytes are held.
+
+    The (possibly truncated) body is stored on the response so that
+    response.content works as usual.
+
+    Args:
+        response (requests.Response): Response opened with stream=True
+        max_bytes (int): Maximum body size to keep, None for no limit
+        deadline (float, optional): time.time() by which the whole body must
+            have arrived, DeadlineExceeded is raised after it
+        on_chunk (callable, optional): Called with each chunk as it arrives,
+            reading stops early once it returns True
+
+    Returns:
+        bool: True if the body was cut off at max_bytes or by on_chunk
+    '''
+    if max_bytes is not None:
+        # a small cap is not read past in one big chunk
+        chunk_size = min(chunk_size, max_bytes + 1)
+    chunks = []
+    size = 0
+    stopped = False
+    try:
+        for chunk in response.iter_content(chunk_size):
+            chunks.append(chunk)
+            size += len(chunk)
+            if (max_bytes is not None) and (size > max_bytes):
+                break
+            if (on_chunk is not None) and on_chunk(chunk):
+                stopped = True
+                break
+            _check_deadline(deadline, response.url)
+    finally:
+        response.close()
+    return _set_capped_content(response, b''.join(chunks), max_bytes) or stopped
+
+
+async def _read_capped_async(response, max_bytes, deadline=None):
+    '''Async counterpart of _read_capped for a streamed httpx.Response.'''
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if (max_bytes is not None) and (size > max_bytes):
+            break
+        _check_deadline(deadline, response.url)
+    return _set_capped_content(response, b''.join(chunks), max_bytes)
+
+
+def _check_deadline(deadline, url):
+    if (deadline is not None) and (time.time() > deadline):
+        raise DeadlineExceeded(f'total deadline passed while reading {url}')
+
+
+def _set_capped_content(response, content, max_bytes):
+    truncated = (max_bytes is not None) and (len(content) > max_bytes)
+    response._content = content[:max_bytes] if truncated else content
+    return truncated
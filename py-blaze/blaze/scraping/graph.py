@@ -0,0 +1,71 @@
+'''Backlink edge lists with interned urls and domains.'''
+from array import array
+import numpy as np
+import pandas as pd
+from .domain import get_basedomain
+
+
+class BacklinkGraph:
+    '''
+    Edges from read pages to the external urls they link to.
+
+    Urls and their base domains are interned to integer ids, so each edge
+    is three ints in typed arrays rather than three strings; frames are only
+    built on demand.
+    '''
+    def __init__(self):
+        # url id -> url, and url -> id
+        self.urls = []
+        self._url_ids = {}
+        # domain id -> base domain, and base domain -> id
+        self.domains = []
+        self._domain_ids = {}
+        # url id -> domain id
+        self.url_domain = array('q')
+        # one entry per edge: requested page, resolved page, linked url
+        self.sources = array('q')
+        self.resolved = array('q')
+        self.targets = array('q')
+
+    def __len__(self):
+        return len(self.targets)
+
+    def _intern(self, url):
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            url_id = self._url_ids[url] = len(self.urls)
+            self.urls.append(url)
+            domain = get_basedomain(url) if url is not None else None
+            domain_id = self._domain_ids.get(domain)
+            if domain_id is None:
+                domain_id = self._domain_ids[domain] = len(self.domains)
+                self.domains.append(domain)
+            self.url_domain.append(domain_id)
+        return url_id
+
+    def add(self, url, resolved_url, to_urls):
+        '''Add an edge from the page to each distinct url in to_urls.'''
+        source = self._intern(url)
+        resolved = self._intern(resolved_url)
+        for to_url in dict.fromkeys(to_urls):
+            self.sources.append(source)
+            self.resolved.append(resolved)
+            self.targets.append(self._intern(to_url))
+
+    def to_frame(self):
+        '''Edges as from_url, from_resolved, to_url strings.'''
+        urls = np.array(self.urls, dtype=object)
+        return pd.DataFrame({
+            'from_url': urls[np.frombuffer(self.sources, dtype=np.int64)],
+            'from_resolved': urls[np.frombuffer(self.resolved, dtype=np.int64)],
+            'to_url': urls[np.frombuffer(self.targets, dtype=np.int64)],
+            })
+
+    def in_degree(self):
+        '''Number of edges pointing into each base domain.'''
+        url_domain = np.frombuffer(self.url_domain, dtype=np.int64)
+        target_domains = url_domain[np.frombuffer(self.targets, dtype=np.int64)]
+        counts = np.bincount(target_domains, minlength=len(self.domains))
+        domains = np.array(self.domains, dtype=object)
+        keep = (counts > 0) & pd.notnull(domains)
+        return pd.DataFrame({'domain': domains[keep], 'in_degree': counts[keep]})
@@ -0,0 +1,109 @@
+'''Host circuit breaker shared by the scraping readers.'''
+import asyncio
+import json
+import os
+import threading
+import time
+import requests
+import httpx
+from .domain import _host
+from .fetch import DeadlineExceeded
+
+
+class HostUnavailable(Exception):
+    pass
+
+
+# errors that say the host itself is unreachable or too slow, as opposed to
+# e.g. an unsupported content type or a parsing problem
+_NETWORK_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+    TimeoutError,
+    DeadlineExceeded,
+    )
+
+
+class HostHealth:
+    '''
+    Registry of failing hosts that trips a circuit after repeated connect or
+    read failures, so that further requests to the host fail instantly
+    until a cool-down window has passed. The state can be saved to a JSON
+    file and is reloaded from it, so dead hosts stay skipped between runs.
+
+    After the cool-down a single probe request is let through again, the
+    others keep failing until it is recorded; any answer from the host
+    closes the circuit, a network failure re-opens it.
+
+    Args:
+        path (str, optional): JSON file to load the state from and save it to
+        max_failures (int): Consecutive failures that open a host's circuit
+        cooldown (float): Seconds a tripped host is failed without a request
+    '''
+    def __init__(self, path=None, max_failures=3, cooldown=6 * 60 * 60):
+        self.path = path
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        # host -> [consecutive failures, time the circuit opened or None]
+        self.hosts = {}
+        self._lock = threading.Lock()
+        if (path is not None) and os.path.exists(path):
+            with open(path) as f:
+                self.hosts = json.load(f)
+
+    def check(self, url):
+        '''Raise HostUnavailable if the url's host has an open circuit.'''
+        host = _host(url)
+        now = time.time()
+        with self._lock:
+            failures, opened = self.hosts.get(host, (0, None))
+            if (opened is None) or (now - opened < self.cooldown):
+                probe = False
+            else:
+                # this request is the probe, the cool-down restarts for the rest
+                probe = True
+                self.hosts[host] = [failures, now]
+        if (opened is not None) and (not probe):
+            raise HostUnavailable(f'{host} failed {failures} times, skipping until cool-down ends')
+
+    def record(self, url, error=None):
+        '''Record the outcome of a request: a success, or the exception it raised.'''
+        host = _host(url)
+        changed = False
+        with self._lock:
+            if not isinstance(error, _NETWORK_ERRORS):
+                # a success, or an error from a response (content type, http
+                # status): the host answered. Only a circuit closing changes
+                # the saved state, not a reset count
+                changed = self.hosts.pop(host, (0, None))[1] is not None
+            else:
+                failures, opened = self.hosts.get(host, (0, None))
+                failures += 1
+                if failures >= self.max_failures:
+                    changed = True
+                    opened = time.time()
+                self.hosts[host] = [failures, opened]
+        # circuits opening (or closing) are rare, persist those straight away
+        if changed:
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            state = json.dumps(self.hosts)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(state)
+        os.replace(tmp_path, self.path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
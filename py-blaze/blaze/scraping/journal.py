@@ -0,0 +1,63 @@
+'''Append-only checkpoint journal of completed pages.'''
+import json
+import os
+from .record import PageRecord
+
+
+class CrawlJournal:
+    '''
+    JSON-lines file with one compact PageRecord per completed page, written
+    as a crawl progresses so the work survives the process being killed.
+
+    Every line is flushed as it is written. A line torn by a crash is
+    ignored when the journal is loaded, and ended before the journal is
+    appended to again so the next record starts on a line of its own.
+
+    Args:
+        path (str): Location of the journal file
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        '''The journaled records by url; later lines win.'''
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = PageRecord(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                records[record.url] = record
+        return records
+
+    def open(self, truncate=False):
+        torn = (not truncate) and self._torn()
+        self._file = open(self.path, 'w' if truncate else 'a', encoding='utf-8')
+        if torn:
+            self._file.write('\n')
+            self._file.flush()
+        return self
+
+    def _torn(self):
+        # whether the last line was cut off before its newline
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def append(self, url, record):
+        fields = {k: getattr(record, k) for k in PageRecord.__slots__}
+        # keyed by the requested url, which is what resume compares against
+        fields['url'] = url
+        self._file.write(json.dumps(fields) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,209 @@
+'''HTML parser backends behind the link and text extraction of URLReader.'''
+import functools
+from bs4 import BeautifulSoup, NavigableString, CData
+from bs4.dammit import UnicodeDammit
+import lxml.etree
+import lxml.html
+from selectolax.lexbor import LexborHTMLParser
+
+# text is taken from the outermost of these tags, never from inside scripts or styles
+_TEXT_TAGS = frozenset(['p', 'code', 'pre', 'span', 'h1', 'h2', 'h3', 'h4'])
+_SKIP_TAGS = frozenset(['script', 'style', 'template'])
+
+
+class SoupDocument:
+    '''
+    BeautifulSoup backed document, using the given bs4 tree builder.
+
+    Every backend exposes the same small interface: title,
+    meta_description, link_tags() and text_blocks().
+    '''
+    _TEXT_TYPES = (NavigableString, CData)
+
+    def __init__(self, content, features='html.parser'):
+        self.soup = BeautifulSoup(content, features)
+
+    @property
+    def title(self):
+        title = self.soup.title
+        return title.text if title is not None else ''
+
+    @property
+    def meta_description(self):
+        meta = self.soup.find('meta', attrs={'name': 'description'})
+        return meta['content'] if meta else ''
+
+    def link_tags(self):
+        '''(tag name, href, type, text) of every <a> and <link> tag in document order.'''
+        return [
+            (tag.name, tag.get('href'), tag.get('type'), tag.text)
+            for tag in self.soup.find_all(['a', 'link'])]
+
+    def text_blocks(self):
+        '''
+        Text of each outermost p/code/pre/span/h1-h4 element in document order,
+        like get_text(separator=' ', strip=True) on each of them.
+
+        The tree is walked once; text in tags nested inside a block (a span in
+        a p, code in a pre) belongs to that block and is not emitted again.
+        '''
+        blocks = []
+        # (node, index of the enclosing block in blocks or -1)
+        stack = [(self.soup, -1)]
+        while stack:
+            node, block = stack.pop()
+            if type(node) in self._TEXT_TYPES:
+                if block >= 0:
+                    string = node.strip()
+                    if string:
+                        blocks[block].append(string)
+                continue
+            name = getattr(node, 'name', None)
+            if (name is None) or (name in _SKIP_TAGS):
+                # comments, doctypes, processing instructions, ...
+                continue
+            if (block < 0) and (name in _TEXT_TAGS):
+                blocks.append([])
+                block = len(blocks) - 1
+            stack.extend((child, block) for child in reversed(node.contents))
+        return [' '.join(parts) for parts in blocks]
+
+
+class LxmlDocument:
+    '''Native lxml.html document, no soup is built.'''
+    def __init__(self, content):
+        parser = lxml.html.HTMLParser(encoding='utf-8')
+        try:
+            self.root = lxml.html.document_fromstring(_to_utf8(content), parser=parser)
+        except lxml.etree.ParserError:
+            # empty document
+            self.root = lxml.html.document_fromstring('<html></html>')
+
+    # lxml trees cannot be pickled, the page is stored as html and re-parsed
+    def __getstate__(self):
+        return {'html': lxml.html.tostring(self.root, encoding='utf-8')}
+
+    def __setstate__(self, state):
+        self.__init__(state['html'])
+
+    @property
+    def title(self):
+        title = self.root.find('.//title')
+        return title.text_content() if title is not None else ''
+
+    @property
+    def meta_description(self):
+        content = self.root.xpath('//meta[@name="description"]/@content')
+        return content[0] if content else ''
+
+    def link_tags(self):
+        return [
+            (el.tag, el.get('href'), el.get('type'), el.text_content())
+            for el in self.root.iter('a', 'link')]
+
+    def text_blocks(self):
+        blocks = []
+        # (element or pending tail string, index of the enclosing block or -1)
+        stack = [(self.root, -1)]
+        while stack:
+            node, block = stack.pop()
+            if isinstance(node, str):
+                _append_stripped(blocks[block], node)
+                continue
+            # the tail is the text after the element, it belongs to the parent
+            if (block >= 0) and node.tail:
+                stack.append((node.tail, block))
+            # comments and processing instructions have a function as tag
+            tag = node.tag
+            if (not isinstance(tag, str)) or (tag in _SKIP_TAGS):
+                continue
+            if (block < 0) and (tag in _TEXT_TAGS):
+                blocks.append([])
+                block = len(blocks) - 1
+            if (block >= 0) and node.text:
+                _append_stripped(blocks[block], node.text)
+            stack.extend((child, block) for child in reversed(node))
+        return [' '.join(parts) for parts in blocks]
+
+
+class SelectolaxDocument:
+    '''selectolax (lexbor) document, the fastest backend.'''
+    # outermost text tags, matched by lexbor's own selector engine
+    _BLOCKS = ':is({0}):not(:is({0}) *)'.format(', '.join(sorted(_TEXT_TAGS)))
+
+    def __init__(self, content):
+        self.tree = LexborHTMLParser(_to_utf8(content))
+        # nothing is read from inside these, drop them up front
+        self.tree.strip_tags(list(_SKIP_TAGS))
+
+    def __getstate__(self):
+        return {'html': self.tree.html or ''}
+
+    def __setstate__(self, state):
+        self.__init__(state['html'])
+
+    @property
+    def title(self):
+        title = self.tree.css_first('title')
+        return title.text() if title is not None else ''
+
+    @property
+    def meta_description(self):
+        meta = self.tree.css_first('meta[name="description"]')
+        return (meta.attributes.get('content') or '') if meta is not None else ''
+
+    def link_tags(self):
+        return [
+            (node.tag, node.attributes.get('href'), node.attributes.get('type'), node.text())
+            for node in self.tree.css('a, link')]
+
+    def text_blocks(self):
+        # strip=True leaves empty strings for whitespace-only nodes, drop those
+        return [
+            ' '.join(filter(None, node.text(separator='\x1f', strip=True).split('\x1f')))
+            for node in self.tree.css(self._BLOCKS)]
+
+
+def _to_utf8(content):
+    '''
+    The page as UTF-8 bytes. lxml and lexbor do not detect encodings the way
+    BeautifulSoup does, so other encodings are converted up front.
+    '''
+    if isinstance(content, str):
+        return content.encode('utf-8')
+    try:
+        content.decode('utf-8')
+        return content
+    except UnicodeDecodeError:
+        return UnicodeDammit(content, is_html=True).unicode_markup.encode('utf-8')
+
+
+def _append_stripped(parts, string):
+    string = string.strip()
+    if string:
+        parts.append(string)
+
+
+_PARSERS = {
+    'html.parser': functools.partial(SoupDocument, features='html.parser'),
+    'lxml': LxmlDocument,
+    'selectolax': SelectolaxDocument,
+    }
+
+
+def parse_html(content, parser='html.parser'):
+    '''
+    Parse an HTML page with the chosen backend.
+
+    Args:
+        content (bytes or str): The page
+        parser (str): 'html.parser' (BeautifulSoup), 'lxml' or 'selectolax'
+
+    Returns:
+        A document with title, meta_description, link_tags() and text_blocks()
+    '''
+    try:
+        backend = _PARSERS[parser]
+    except KeyError:
+        raise ValueError(f'Unknown parser {parser}, expected one of {list(_PARSERS)}')
+    return backend(content)
@@ -0,0 +1,70 @@
+'''Compact page records kept in a lean corpus.'''
+
+
+class PageRecord:
+    '''
+    What a corpus needs from a read page, without the response, parsed tree
+    or reader settings. CorpusReader(lean=True) stores these instead of
+    SiteParse objects; extract, filter_new and get_backlinks work on both.
+
+    Attributes:
+        url (str): The requested url
+        resolved_url (str): The url after redirects
+        basedomain (str): Base domain of the requested url
+        status_code (int): HTTP status, None if the page was not fetched
+        text (str): Extracted page text
+        links (dict): Links by kind, as URLReader.links
+        timings (dict): Seconds spent fetching and parsing
+        truncated (bool): The body was cut off at max_bytes
+        fetched (bool): A response was received
+    '''
+    __slots__ = (
+        'url', 'resolved_url', 'basedomain', 'status_code', 'text', 'links',
+        'timings', 'truncated', 'fetched')
+
+    def __init__(
+            self,
+            url,
+            resolved_url=None,
+            basedomain=None,
+            status_code=None,
+            text=None,
+            links=None,
+            timings=None,
+            truncated=False,
+            fetched=False):
+        self.url = url
+        self.resolved_url = resolved_url
+        self.basedomain = basedomain
+        self.status_code = status_code
+        self.text = text
+        self.links = links
+        self.timings = timings
+        self.truncated = truncated
+        self.fetched = fetched
+
+    @classmethod
+    def from_page(cls, page):
+        '''Reduce a read URLReader / SiteParse to its record.'''
+        return cls(
+            url=page.url,
+            resolved_url=page.resolved_url,
+            basedomain=page.basedomain,
+            status_code=getattr(page, 'status_code', None),
+            text=page.text,
+            links=page.links,
+            timings=page.timings,
+            truncated=page.truncated,
+            fetched=page.fetched)
+
+    def __repr__(self):
+        return f'PageRecord({self.url!r}, status_code={self.status_code})'
+
+
+def _as_record(url, page):
+    # corpus entries are SiteParse objects, PageRecords, or None for failed reads
+    if isinstance(page, PageRecord):
+        return page
+    if page is None:
+        return PageRecord(url)
+    return PageRecord.from_page(page)
@@ -0,0 +1,144 @@
+'''Per-host politeness scheduling for CorpusReader.'''
+import asyncio
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from .domain import _host
+from .fetch import _get_session
+
+
+class HostScheduler:
+    '''
+    Rate limits requests per host with a token bucket and caps the number of
+    requests in flight to any one host, without limiting concurrency across
+    hosts.
+
+    Args:
+        rate (float, optional): Requests per second allowed to each host, None for no limit
+        burst (int): Number of requests a host may receive back to back
+        max_in_flight (int): Maximum concurrent requests to each host
+        robots (bool): Also honour the Crawl-delay in each host's robots.txt,
+            fetched once per host and cached
+        user_agent (str): User agent used to fetch and interpret robots.txt
+        timeout (int): Timeout in seconds for fetching robots.txt
+    '''
+    def __init__(
+            self,
+            rate=None,
+            burst=1,
+            max_in_flight=2,
+            robots=False,
+            user_agent='*',
+            timeout=10,
+            poll_interval=0.1):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.robots = robots
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.crawl_delays = {}
+        # host -> [tokens, last refill time, requests in flight]
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._robots_locks = {}
+
+    # locks cannot be pickled, a restored scheduler gets fresh ones
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_robots_locks']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._robots_locks = {}
+
+    def acquire(self, url):
+        '''Block until a request to the url's host is allowed.'''
+        host = _host(url)
+        if self.robots:
+            self._crawl_delay(url, host)
+        while True:
+            wait = self._try_acquire(host)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        '''Wait, without blocking the event loop, until a request to the url's host is allowed.'''
+        host = _host(url)
+        if self.robots and (host not in self.crawl_delays):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._crawl_delay, url, host)
+        while True:
+            wait = self._try_acquire(host)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, url):
+        with self._lock:
+            self._hosts[_host(url)][2] -= 1
+
+    def _host_rate(self, host):
+        delay = self.crawl_delays.get(host)
+        if not delay:
+            return self.rate
+        if self.rate is None:
+            return 1 / delay
+        return min(self.rate, 1 / delay)
+
+    def _try_acquire(self, host):
+        '''Take a slot for the host if one is free, else return the seconds to wait.'''
+        rate = self._host_rate(host)
+        # a crawl delay means one request at a time, spaced out
+        burst = 1 if self.crawl_delays.get(host) else self.burst
+        now = time.monotonic()
+        with self._lock:
+            state = self._hosts.setdefault(host, [burst, now, 0])
+            if state[2] >= self.max_in_flight:
+                return self.poll_interval
+            if rate is not None:
+                state[0] = min(burst, state[0] + (now - state[1]) * rate)
+                state[1] = now
+                if state[0] < 1:
+                    return (1 - state[0]) / rate
+                state[0] -= 1
+            state[2] += 1
+            return 0
+
+    def _crawl_delay(self, url, host):
+        # one robots.txt fetch per host, however many threads ask at once
+        with self._lock:
+            host_lock = self._robots_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            if host in self.crawl_delays:
+                return self.crawl_delays[host]
+            delay = None
+            try:
+                parsed = urlparse(url)
+                response = _get_session(self.user_agent).get(
+                    f'{parsed.scheme}://{parsed.netloc}/robots.txt', timeout=self.timeout)
+                if response.status_code == 200:
+                    robots = RobotFileParser()
+                    robots.parse(response.text.splitlines())
+                    delay = robots.crawl_delay(self.user_agent)
+            except Exception:
+                pass
+            self.crawl_delays[host] = float(delay) if delay else None
+            return self.crawl_delays[host]
+
+
+def _interleave_by_host(url_list):
+    '''Reorder urls round-robin across hosts, so one busy host does not hold up the others.'''
+    by_host = {}
+    for url in url_list:
+        by_host.setdefault(_host(url), []).append(url)
+    queues = list(by_host.values())
+    interleaved = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        interleaved += [q[i] for q in queues if i < len(q)]
+    return interleaved
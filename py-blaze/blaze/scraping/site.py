@@ -1,7 +1,10 @@
 import re
+import time
+import concurrent.futures
 from io import BytesIO
 import feedparser
 from ..scraping.url import URLReader, _clean_links, _strip_trailing_slash
+from ..scraping.feeds import FeedStream
 
 class SiteParse(URLReader):
     def __init__(
@@ -12,35 +15,44 @@ class SiteParse(URLReader):
             timeout=60, 
             headless=False, 
             verbose=True, 
-            debug=False):
-        super().__init__(url)
-        self.join_char = join_char
-        self.chrome_driver_path = chrome_driver_path
-        self.timeout = timeout
-        self.headless = headless
-        self.verbose = verbose
-        self.debug = debug
+            debug=False,
+            cache=None,
+            max_bytes=5 * 1024**2,
+            connect_timeout=10,
+            read_timeout=30,
+            health=None,
+            parser='html.parser'):
+        super().__init__(
+            url,
+            join_char=join_char,
+            chrome_driver_path=chrome_driver_path,
+            timeout=timeout,
+            headless=headless,
+            verbose=verbose,
+            debug=debug,
+            cache=cache,
+            max_bytes=max_bytes,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            health=health,
+            parser=parser)
 
     def _blogs(self):
         # look for blog links
         blog_links = self.links['blog']
         rss_feeds = self.links['rss']
         if (len(rss_feeds) == 0) and (len(blog_links) > 0):
-            try:
-                blog_links = sorted(blog_links, key=len)
-                print('  Blog links: ', blog_links) if self.verbose else None
-                blog_links_to_check = blog_links[:5]
-                for link in blog_links_to_check:
-                    rss_feeds += URLReader(
-                        link, 
-                        headless=self.headless,
-                        verbose=True, \
-                        timeout=self.timeout
-                        ).read().links['rss']
-            except Exception as e:
-                pass
+            blog_links = sorted(blog_links, key=len)
+            print('  Blog links: ', blog_links) if self.verbose else None
+            # read the blog pages concurrently, stop at the first that links a feed
+            found = _first_found(
+                lambda link, timeout: self._reader(link, verbose=True, timeout=timeout).read().links['rss'],
+                blog_links[:5],
+                timeout=self.timeout)
+            rss_feeds += found or []
         if ((len(rss_feeds)) == 0):
-            rss_feeds = _guess_rss([self.basedomain] + blog_links[:5], timeout=self.timeout)
+            rss_feeds = _guess_rss(
+                [self.basedomain] + blog_links[:5], timeout=self.timeout, health=self.health)
             self.links['rss'] = rss_feeds
         print('  RSS links:', rss_feeds) if self.verbose else None
 
@@ -55,27 +67,75 @@ class SiteParse(URLReader):
         self.about_links = sorted(list(set(about_links)), key=len)
         print('  About links:', self.about_links) if self.verbose else None
         try:
-            self.about_text = URLReader(
-                self.about_links[0],
-                headless=self.headless,
-                timeout=self.timeout 
-                ).read().text
+            self.about_text = self._reader(self.about_links[0]).read().text
             self.text = self.about_text + ' ' + self.text
         except Exception as e:
             pass
 
-def read_rss(rss_feed, timeout):
-    page = URLReader(url=rss_feed, timeout=timeout, headless=False)
-    page._request(parser=None)
+    def _reader(self, url, **kwargs):
+        # a URLReader for a follow-up page, fetched with this page's settings
+        settings = dict(
+            headless=self.headless,
+            timeout=self.timeout,
+            cache=self.cache,
+            max_bytes=self.max_bytes,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            health=self.health,
+            parser=self.parser)
+        settings.update(kwargs)
+        return URLReader(url, **settings)
+
+def read_rss(
+        rss_feed, timeout, cache=None, max_bytes=None, health=None, max_entries=None, max_age=None,
+        check_type=False):
+    page = URLReader(
+        url=rss_feed, 
+        timeout=timeout, 
+        headless=False, 
+        cache=cache, 
+        max_bytes=max_bytes, 
+        health=health)
+    stream = None
+    if (max_entries is not None) or (max_age is not None):
+        # capped: parse the entries as the body arrives and stop the download at the cap
+        stream = FeedStream(max_entries=max_entries, max_age=max_age, url=rss_feed)
+    # feeds are served with all sorts of content types, only HTML pages are gated
+    page._request(
+        parse=False, check_type=check_type, on_chunk=stream.feed if stream is not None else None)
+    if page.not_modified:
+        # unchanged since the last poll: no new entries, skip feedparser
+        return feedparser.FeedParserDict(
+            entries=[], feed=feedparser.FeedParserDict(), bozo=0, status=304)
+    if stream is not None:
+        return stream.result(page.response.content)
     # Put it to memory stream object universal feedparser
     content = BytesIO(page.response.content)
     # Parse content
     feed_parsed = feedparser.parse(content)
     return feed_parsed
 
-def _ping_rss(url, timeout):
+# a feed names its root element within the first KB
+_SNIFF_BYTES = 1024
+_FEED_MARKERS = (b'<rss', b'<feed', b'<rdf')
+
+def _ping_rss(url, timeout, health=None):
     try:
-        d = read_rss(url, timeout=timeout)
+        # partial GET: only the first KB is asked for, and read even from a
+        # server that ignores the Range header. Feeds are often served as
+        # text/plain or application/octet-stream, so the body is sniffed
+        # instead of trusting the content type
+        page = URLReader(
+            url, timeout=timeout, headless=False, verbose=False, max_bytes=_SNIFF_BYTES, health=health)
+        page._request(parse=False, headers={'Range': f'bytes=0-{_SNIFF_BYTES - 1}'}, check_type=False)
+        head = page.response.content.lower()
+        if (page.status_code not in (200, 206)) or not any(m in head for m in _FEED_MARKERS):
+            return False
+        # looks like a feed, confirm with a full feedparser parse
+        if _whole_body(page):
+            d = feedparser.parse(BytesIO(page.response.content))
+        else:
+            d = read_rss(url, timeout=timeout, health=health)
         if d.bozo == 0:
             if len(d.entries) > 0:
                 return True
@@ -87,16 +147,60 @@ def _ping_rss(url, timeout):
         print(f"Failed to connect to {url}")
         return False
 
-def _guess_rss(base_urls, timeout):
-    feeds = []
+def _whole_body(page):
+    # whether the sniff already holds the whole document
+    if page.truncated:
+        return False
+    if page.status_code == 206:
+        total = page.response.headers.get('Content-Range', '').rpartition('/')[2]
+        return total.isdigit() and (int(total) <= len(page.response.content))
+    return True
+
+def _guess_rss(base_urls, timeout, health=None):
     patterns = ['index.xml', 'feed/', 'feed.xml', 'rss/']
-    for url in base_urls:
-        for pattern in patterns:
-            try_url = _strip_trailing_slash(url) + '/' + pattern
-            print('    ~ RSS guessing: ', try_url)
-            try_ping = _ping_rss(try_url, timeout=timeout)
-            if try_ping:
-                feeds += [try_url]
-    feeds = list(set(feeds))
+    try_urls = list(dict.fromkeys(
+        _strip_trailing_slash(url) + '/' + pattern
+        for url in base_urls for pattern in patterns))
+
+    def probe(try_url, timeout):
+        print(f'    ~ RSS guessing:  {try_url}')
+        return try_url if _ping_rss(try_url, timeout=timeout, health=health) else None
+
+    # all probes share one deadline, the first confirmed feed wins
+    feed = _first_found(probe, try_urls, timeout=timeout)
+    feeds = [feed] if feed else []
     print('  Guessed RSS ', feeds)
-    return feeds
\ No newline at end of file
+    return feeds
+
+def _first_found(fn, items, timeout, max_workers=4):
+    '''
+    Call fn(item, timeout) for the items concurrently and return the first
+    truthy result, or None if there is none before the deadline.
+
+    Every call gets the time left until a deadline shared by all of them;
+    calls that have not started once a result is found are cancelled.
+    '''
+    deadline = time.time() + timeout
+
+    def call(item):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        return fn(item, remaining)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(call, item) for item in items]
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=timeout):
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            if result:
+                return result
+    except concurrent.futures.TimeoutError:
+        pass
+    finally:
+        # probes already running finish within the deadline in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+    return None
\ No newline at end of file
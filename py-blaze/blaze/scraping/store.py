@@ -0,0 +1,117 @@
+'''Columnar, append-only on-disk corpus.'''
+import glob
+import os
+import time
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from .record import PageRecord
+
+_LINK_KINDS = ['internal', 'subdomain', 'rss', 'blog', 'email', 'external']
+_TIMINGS = ['fetch', 'parse']
+
+# one row per page
+CORPUS_SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('resolved_url', pa.string()),
+    ('basedomain', pa.string()),
+    ('status_code', pa.int32()),
+    ('text', pa.large_string()),
+    ('links', pa.struct([(k, pa.list_(pa.string())) for k in _LINK_KINDS])),
+    ('timings', pa.struct([(k, pa.float64()) for k in _TIMINGS])),
+    ('truncated', pa.bool_()),
+    ('fetched', pa.bool_()),
+    ('dt_fetched', pa.timestamp('us')),
+    ])
+
+
+class CorpusStore:
+    '''
+    A corpus saved as a directory of Arrow IPC files, one file per crawl
+    batch. Appending a batch writes a new file and never rewrites the
+    existing ones.
+
+    The files are uncompressed so they can be memory-mapped: reading a few
+    columns only touches those columns' pages on disk.
+
+    Args:
+        path (str): Directory holding the batch files
+    '''
+    def __init__(self, path):
+        self.path = path
+
+    def parts(self):
+        # file names start with a nanosecond timestamp, so this is append order
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.arrow')))
+
+    def append(self, records, dt_fetched=None):
+        '''
+        Write a batch of pages as a new file.
+
+        Args:
+            records (iterable of PageRecord): The pages
+            dt_fetched (datetime, optional): When the batch was crawled
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        table = _to_table(records, dt_fetched)
+        name = os.path.join(self.path, f'part-{time.time_ns()}-{os.getpid()}.arrow')
+        # written under a temporary name, readers never see a partial file
+        with pa.OSFile(f'{name}.tmp', 'wb') as sink:
+            with ipc.new_file(sink, CORPUS_SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(f'{name}.tmp', name)
+        return name
+
+    def clear(self, parts=None):
+        '''Remove the given batch files, all of them if None.'''
+        for part in (self.parts() if parts is None else parts):
+            os.remove(part)
+
+    def read(self, columns=None, memory_map=True):
+        '''
+        Read the corpus as a pyarrow.Table.
+
+        Args:
+            columns (list, optional): Columns to read, all if None
+            memory_map (bool): Map the files instead of reading them into memory
+        '''
+        schema = CORPUS_SCHEMA if columns is None else pa.schema([CORPUS_SCHEMA.field(c) for c in columns])
+        tables = []
+        for part in self.parts():
+            source = pa.memory_map(part) if memory_map else pa.OSFile(part)
+            table = ipc.open_file(source).read_all()
+            tables.append(table if columns is None else table.select(columns))
+        if not tables:
+            return schema.empty_table()
+        return pa.concat_tables(tables)
+
+    def to_pandas(self, columns=None, memory_map=True):
+        return self.read(columns, memory_map=memory_map).to_pandas()
+
+    def records(self, columns=None):
+        '''PageRecords for every row; attributes not in columns keep their defaults.'''
+        if columns is not None:
+            # records are keyed by url and fetched decides if they are used
+            columns = list(dict.fromkeys(['url', 'fetched'] + list(columns)))
+        table = self.read(columns)
+        fields = [c for c in table.column_names if c in PageRecord.__slots__]
+        return [PageRecord(**row) for row in table.select(fields).to_pylist()]
+
+
+def _to_table(records, dt_fetched=None):
+    columns = {name: [] for name in CORPUS_SCHEMA.names}
+    for record in records:
+        columns['url'].append(record.url)
+        columns['resolved_url'].append(record.resolved_url)
+        columns['basedomain'].append(record.basedomain)
+        columns['status_code'].append(record.status_code)
+        columns['text'].append(record.text)
+        links = record.links
+        columns['links'].append(
+            {k: links.get(k) for k in _LINK_KINDS} if links is not None else None)
+        timings = record.timings
+        columns['timings'].append(
+            {k: timings.get(k) for k in _TIMINGS} if timings else None)
+        columns['truncated'].append(record.truncated)
+        columns['fetched'].append(record.fetched)
+        columns['dt_fetched'].append(dt_fetched)
+    return pa.table(columns, schema=CORPUS_SCHEMA)
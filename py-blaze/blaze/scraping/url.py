@@ -2,14 +2,14 @@ from urllib.parse import urlparse, urlunparse
 import re
 import time
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-import tldextract
 import ssl
 import functools
+from .parsers import parse_html
+from .fetch import _get_session, _check_content_type, _read_capped, _read_capped_async
+from .domain import get_basedomain, extract_domain
+from ..utils.canonical import absolute_url, canonicalize, url_key
+from .browser import _get_driver_pool, _wait_for_network_idle, _scroll_to_bottom
 if hasattr(ssl, '_create_unverified_context'):
     ssl._create_default_https_context = ssl._create_unverified_context
 user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
@@ -42,31 +42,84 @@ class URLReader:
             headless=False,
             verbose=True,
             debug=False,
+            cache=None,
+            max_bytes=5 * 1024**2,
+            connect_timeout=10,
+            read_timeout=30,
+            health=None,
+            parser='html.parser',
             ):
         self.url = url
         self.resolved_url = url
         self.chrome_driver_path = chrome_driver_path
         self.basedomain = get_basedomain(self.url)
         self.basedomain_list = [self.basedomain]
+        # timeout is the total deadline for a page, connect and read
+        # timeouts bound each network wait within it
         self.timeout = timeout
+        self.connect_timeout = min(connect_timeout, timeout)
+        self.read_timeout = min(read_timeout, timeout)
+        # optional HostHealth, requests to hosts with an open circuit fail instantly
+        self.health = health
         self.headless = headless
         self.join_char = join_char
         self.user_agent = user_agent
         self.verbose = verbose
         self.debug = debug
+        # optional ResponseCache, makes requests conditional on ETag/Last-Modified
+        self.cache = cache
+        self.not_modified = False
+        # bodies are cut off after max_bytes (None for no limit)
+        self.max_bytes = max_bytes
+        self.truncated = False
         self.links = None
         self.text = None
         self.text_list = None
         self.response = None
-        self.soup = None
+        # 'html.parser', 'lxml' or 'selectolax', see parsers.parse_html
+        self.parser = parser
+        self.document = None
+        # seconds spent fetching and parsing the page
+        self.timings = {}
 
-    def read(self):
-        self._request()
-        self._find_links()
-        self._find_text()
+    def read(self, response=None, pool=None):
+        start = time.perf_counter()
+        # response may be supplied by a caller that fetched the page itself
+        if response is None:
+            self._request(parse=pool is None)
+        else:
+            self._set_response(response, parse=pool is None)
+        if pool is None:
+            self._find_links()
+            self._find_text()
+        else:
+            # parse in a worker process, only the links and text come back
+            content = self.response if isinstance(self.response, str) else self.response.content
+            self.links, self.text = pool.submit(
+                _extract_page,
+                content,
+                self.url,
+                self.basedomain_list,
+                parser=self.parser,
+                join_char=self.join_char).result()
+        elapsed = time.perf_counter() - start
+        self.timings['parse'] = elapsed - self.timings.get('fetch', 0) if response is None else elapsed
         return self      
 
-    def _request(self, parser='html.parser'):
+    @property
+    def soup(self):
+        # the BeautifulSoup tree, only built by the html.parser backend
+        return getattr(self.document, 'soup', None)
+
+    @property
+    def fetched(self):
+        return self.response is not None
+
+    def _request(self, parse=True, headers=None, check_type=True, on_chunk=None):
+        # headers are sent on top of the cache's conditional ones; with
+        # check_type=False the body is read whatever its declared content type;
+        # on_chunk sees the body as it arrives and can stop the download
+        start = time.perf_counter()
         if self.headless:
             try:
                 self.response, self.resolved_url = _fetch_page_with_headless_browser(
@@ -74,44 +127,104 @@ class URLReader:
                     chrome_driver_path=self.chrome_driver_path, 
                     user_agent=self.user_agent,
                     timeout=self.timeout)
-                if parser is not None:
-                    self.soup = BeautifulSoup(self.response, parser)
+                self.timings['fetch'] = time.perf_counter() - start
+                if parse:
+                    self.document = parse_html(self.response, self.parser)
             except Exception as e:
                 print('Error:', e, 'could not fetch page: ', self.url)
+            self.basedomain_list = list(set([self.basedomain, get_basedomain(self.resolved_url)]))
         else:
-            # Fetch the HTML content of the URL using requests
-            session = requests.Session()
-            session.headers.update({'User-Agent': self.user_agent})
-            self.response = session.get(self.url, timeout=self.timeout)
-            # If the request is successful (status code 200), parse the content
-            self.status_code = self.response.status_code
-            if self.response.status_code == 200:
-                self.resolved_url = self.response.url
-            if parser is not None:
-                self.soup = BeautifulSoup(self.response.content, parser)
+            if self.health is not None:
+                self.health.check(self.url)
+            # Fetch the HTML content of the URL over this thread's pooled session
+            session = _get_session(self.user_agent)
+            request_headers = self.cache.headers(self.url) if self.cache is not None else {}
+            request_headers.update(headers or {})
+            deadline = time.time() + self.timeout
+            try:
+                response = session.get(
+                    self.url, 
+                    timeout=(self.connect_timeout, self.read_timeout), 
+                    headers=request_headers, 
+                    stream=True)
+                # decide from the headers whether the body is worth downloading at all
+                try:
+                    if check_type:
+                        _check_content_type(response, self.url)
+                except Exception:
+                    response.close()
+                    raise
+                self.truncated = _read_capped(
+                    response, self.max_bytes, deadline=deadline, on_chunk=on_chunk)
+            except Exception as e:
+                self._record_health(e)
+                raise
+            self._record_health()
+            self.timings['fetch'] = time.perf_counter() - start
+            self._set_response(response, parse=parse)
+
+    async def _request_async(self, client):
+        # fetch with a shared httpx.AsyncClient; the body is parsed later by read(response=...)
+        if self.health is not None:
+            self.health.check(self.url)
+        headers = self.cache.headers(self.url) if self.cache is not None else None
+        start = time.perf_counter()
+        deadline = time.time() + self.timeout
+        try:
+            async with client.stream('GET', self.url, headers=headers) as response:
+                _check_content_type(response, self.url)
+                self.truncated = await _read_capped_async(
+                    response, self.max_bytes, deadline=deadline)
+        except Exception as e:
+            self._record_health(e)
+            raise
+        self._record_health()
+        self.timings['fetch'] = time.perf_counter() - start
+        self.response = response
+        return response
+
+    def _record_health(self, error=None):
+        if self.health is not None:
+            self.health.record(self.url, error)
+
+    def _set_response(self, response, parse=True):
+        # accepts a requests.Response or an httpx.Response
+        self.response = response
+        if self.cache is not None:
+            # a 304 gets the cached body back
+            self.not_modified = self.cache.update(self.url, response)
+        # If the request is successful (status code 200, or 304 from cache), parse the content
+        self.status_code = response.status_code
+        if response.status_code in (200, 304):
+            self.resolved_url = str(response.url)
+        if parse:
+            self.document = parse_html(response.content, self.parser)
 
         self.basedomain_list = list(set([self.basedomain, get_basedomain(self.resolved_url)]))
         
         
     def _find_links(self):
-        exclude = []
+        exclude = set()
+
+        # walk the <a> and <link> tags once, bucketing raw hrefs
+        hrefs = _collect_links(self.document)
 
         # GET RSS FEEDS
         rss_feeds, exclude = _get_rss_feeds(
-            self.soup, self.basedomain, exclude=exclude)
+            hrefs['rss'], self.basedomain, exclude=exclude)
 
         # GET EMAIL ADDRESSES
         email_addresses, exclude = _get_email_links(
-            self.soup, exclude=exclude)
+            hrefs['email'], exclude=exclude)
 
         # GET BLOG LINKS
         blog_links, exclude = _get_blog_links(
-            self.soup, self.basedomain, exclude=exclude)
+            hrefs['blog'], self.basedomain, exclude=exclude)
 
         # GET ALL OTHER LINKS: internal, subdomain & external
         int_urls, sub_urls, ext_urls = \
             _get_other_links(
-                soup=self.soup, 
+                links=hrefs['anchor'], 
                 basedomain=self.basedomain, 
                 basedomain_list=self.basedomain_list, 
                 exclude=exclude)
@@ -129,53 +242,40 @@ class URLReader:
         
     def _find_text(self):
         # meta description and title
-        soup_ttl = self.soup.title
-        meta_title = soup_ttl.text if soup_ttl is not None else ''
-        meta_description = self.soup.find('meta', attrs={'name': 'description'})
-        meta_description = meta_description['content'] if meta_description else ''
+        meta_title = self.document.title
+        meta_description = self.document.meta_description
         # Remove all HTML tags and formatting and get only the plain text
-        textbits = self.soup.find_all(['p', 'code', 'pre', 'span', 'h1', 'h2', 'h3', 'h4'])
-        textbits = textbits if textbits else ''
-        # get the text from each tag
-        text_list = [meta_title, meta_description] + \
-            [x.get_text(separator=' ', strip=True) for x in textbits]
+        text_list = [meta_title, meta_description] + self.document.text_blocks()
         # remove any strings that contain only one word
         text_list = [x for x in text_list if len(x.split()) > 1]
-        #  clean each string
-        text_list = [_clean_text(x) for x in text_list]
+        #  clean all strings in one batch
+        text_list = _clean_texts(text_list)
         # join the list of strings into one string
         self.text = self.join_char.join(text_list)
 
+def _extract_page(content, url, basedomain_list, parser='html.parser', join_char=' '):
+    '''
+    Parse a page and return its (links, text).
+
+    Takes and returns plain data only, so it can run in a worker process;
+    the parsed tree never leaves the process.
+    '''
+    page = URLReader(url, parser=parser, join_char=join_char, verbose=False)
+    page.basedomain_list = basedomain_list
+    page.document = parse_html(content, parser)
+    page._find_links()
+    page._find_text()
+    return page.links, page.text
+
 def _strip_trailing_slash(url):
     # trim off trailing /
     if url.endswith('/'):
         url = url[:-1]
     return url
 
-def get_basedomain(url):
-    try:
-        parsed_uri = urlparse(url)
-        result = f'{parsed_uri.scheme}://{parsed_uri.netloc}/'
-        # if medium, dev.to blog, or google site truncate to the base domain + path[1]
-        site_list = {
-            'medium.com': ['medium.com/about'],
-            'sites.google.com':[],
-            'dev.to':['dev.to/t/', 'dev.to/tags/', 'dev.to/about/', 'dev.to/terms', 'dev.to/privacy', 'dev.to/faq', 'dev.to/pod', 'dev.to/forem'],
-            }
-        # cycle through the site list and check if the url contains the site
-        for s in list(site_list.keys()):
-            s_in_exclude = any([x in url for x in site_list[s]])
-            if (s in parsed_uri.netloc) and not s_in_exclude:
-                if parsed_uri.path != '':
-                    result = result + parsed_uri.path.split('/')[1]
-                    break
-    except:
-        result = None
-    return result
-    
 def _fetch_page_with_headless_browser(url, timeout, user_agent, proxies=None, chrome_driver_path=None):
     """
-    Fetches webpage content using a headless Chrome browser with customized settings.
+    Fetches webpage content using a warm headless Chrome browser leased from a shared pool.
     
     Args:
         url (str): The URL to fetch
@@ -187,196 +287,195 @@ def _fetch_page_with_headless_browser(url, timeout, user_agent, proxies=None, ch
     Returns:
         tuple: (page_source, resolved_url) containing the HTML content and final URL after redirects
     """
-    # Configure headless browser
-    options = Options()
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument("--disable-extensions")
-    options.add_argument('--headless')
-    options.add_argument("--incognito")
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    options.add_argument(f'user-agent={user_agent}')
-
-    if chrome_driver_path:
-        s = Service()
-        driver = webdriver.Chrome(executable_path=chrome_driver_path, service=s, options=options)
-    else:
-        s = Service()
-        driver = webdriver.Chrome(service=s, options=options)
-    driver.set_page_load_timeout(timeout)
-    try:
-        driver.get(url)
-        user_agent = driver.execute_script("return navigator.userAgent;")
-        time.sleep(1)
-        _scroll_to_bottom(driver, timeout)
-    except:
-        print(f'  Problem reading {url}')
-    finally:
+    pool = _get_driver_pool(user_agent, chrome_driver_path)
+    with pool.lease() as driver:
+        driver.set_page_load_timeout(timeout)
+        try:
+            driver.get(url)
+            _wait_for_network_idle(driver, timeout)
+            _scroll_to_bottom(driver, timeout)
+        except:
+            print(f'  Problem reading {url}')
         page_source = driver.page_source
         resolved_url = driver.current_url
-        driver.delete_all_cookies()
-        driver.quit()
 
     return page_source, resolved_url
 
-def _scroll_to_bottom(driver, timeout, scroll_pause_time=1):
-    last_height = driver.execute_script("return document.body.scrollHeight")
-    start_time = time.time()
-    while True:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(scroll_pause_time)
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        # keep track of the time elapsed, if the time elapsed is greater than the timeout, exit
-        elapsed_time = time.time() - start_time
-        if (new_height == last_height) or (elapsed_time > timeout):
-            break
-        last_height = new_height
-
 def _clean_links(url_list, basedomain):
-    # remove None and / from the list
-    url_list = [x for x in url_list if x not in ['/', None]]
-    # if starts with www. then add https://
-    url_list = ['https://' + x if x.startswith('www.') else x for x in url_list]
-    # if starts with // then add https:
-    url_list = ['https:' + x if x.startswith('//') else x for x in url_list]
-    # starts with / is relative to base
-    url_list = [_strip_trailing_slash(basedomain) + x 
-                if x.startswith('/') else x for x in url_list]
-    # if does not start with http assume relative to base
-    url_list = [_strip_trailing_slash(basedomain) + '/' + x
-                if not x.startswith('http') else x for x in url_list]
-    # dedupe
-    return list(set(url_list))
-
-def _get_rss_feeds(soup, basedomain, exclude):
-    # Find all the <link> or <a> tags with a type attribute of 'application/rss+xml'
-    rss_link = soup.find_all('link', type='application/rss+xml')
-    rss_a = soup.find_all('a', type='application/rss+xml')
-    atom_link = soup.find_all('link', type='application/atom+xml')
-    atom_a = soup.find_all('a', type='application/atom+xml')
-    # html a tags with feedburner in the href
-    feed_patterns = [
-        'feedburner', 'feed.rss', 'index.xml', 
-        'rss.xml', 'blog.xml', 'feed.xml', '/feed/?$', 
-        '/rss/?$', 'atom.xml', 'posts.xml'
-        ]
-    link_list = []
-    for pattern in feed_patterns:
-        link_list += soup.find_all('a', href=lambda x: x and re.search(pattern, x) is not None)
-    # rss found
-    rss_links = rss_link + rss_a + atom_link + atom_a + link_list
-    rss_feeds_raw = [x.get('href') for x in rss_links]
+    # resolve against the base, canonicalize and dedupe in one pass,
+    # keeping the first link of each key in page order
+    links = {}
+    for x in url_list:
+        if x in ('/', None):
+            continue
+        url = canonicalize(absolute_url(x, basedomain))
+        links.setdefault(url_key(url), url)
+    return list(links.values())
+
+# feeds advertised by type, or by one of these patterns in an <a> href
+_FEED_TYPES = {'application/rss+xml', 'application/atom+xml'}
+_FEED_HREF = re.compile('|'.join([
+    'feedburner', 'feed.rss', 'index.xml', 
+    'rss.xml', 'blog.xml', 'feed.xml', '/feed/?$', 
+    '/rss/?$', 'atom.xml', 'posts.xml'
+    ]))
+# feed links that contain these patterns are excluded
+_FEED_EXCLUDE = ['/category/', '/tag/', '/tags/']
+_BLOG_HREF = re.compile('|'.join([
+    r'/blog\.', '/blog/?$', '/posts?/?$', r'blog\.html$', '/articles?/?$',
+    r'posts\.html$', '/news/?$', r'\.substack\.com/?', r'medium\.com/?', r'dev\.to/?', 
+    'newsletter/?$'
+    ]))
+_BLOG_TEXT = re.compile('^blog$', re.IGNORECASE)
+_EMAIL_HREF = re.compile('mailto:')
+
+def _collect_links(document):
+    """
+    Collects raw hrefs from a single pass over the <a> and <link> tags of a page.
+    
+    Args:
+        document: Parsed HTML content, see parsers.parse_html
+        
+    Returns:
+        dict: raw hrefs keyed by 'rss', 'email', 'blog' and 'anchor' (every <a> tag)
+    """
+    rss, email, blog, anchor = [], [], [], []
+    for name, href, type_, text in document.link_tags():
+        if type_ in _FEED_TYPES:
+            rss.append(href)
+        if name != 'a':
+            continue
+        anchor.append(href)
+        if href:
+            if _FEED_HREF.search(href):
+                rss.append(href)
+            if _EMAIL_HREF.search(href):
+                email.append(href)
+            if _BLOG_HREF.search(href):
+                blog.append(href)
+        if _BLOG_TEXT.search(text):
+            blog.append(href)
+    return {'rss': rss, 'email': email, 'blog': blog, 'anchor': anchor}
+
+def _get_rss_feeds(rss_links, basedomain, exclude):
+    rss_feeds_raw = [x for x in rss_links if x is not None]
     # exclude links that contain these patterns
-    exclude_patterns = ['/category/', '/tag/', '/tags/']
     rss_feeds_clean = [x for x in rss_feeds_raw if not any(
-        pattern in x for pattern in exclude_patterns)]
+        pattern in x for pattern in _FEED_EXCLUDE)]
     rss_feeds_clean =_clean_links(rss_feeds_clean, basedomain)
     rss_feeds_clean = [x for x in rss_feeds_clean if x not in exclude]
-    exclude = exclude + rss_feeds_raw + rss_feeds_clean
-    return list(set(rss_feeds_clean)), list(set(exclude))
-
-def _get_blog_links(soup, basedomain, exclude):
-    blog_patterns = [
-        '/blog\.', '/blog/?$', '/posts?/?$', 'blog\.html$', '/articles?/?$',
-        'posts\.html$', '/news/?$', '\.substack\.com/?', 'medium\.com/?', 'dev\.to/?', 
-        'newsletter/?$'
-        ]
-    blog_links = []
-    for pattern in blog_patterns:
-        blog_links += soup.find_all(
-            'a', href=lambda x: x and re.search(pattern, x) is not None)
-    blog_links += soup.find_all(
-        lambda tag: tag.name == 'a' and re.search('^blog$', tag.text, re.IGNORECASE))
-    blog_links_raw = [x.get('href') for x in blog_links]
+    exclude = exclude.union(rss_feeds_raw, rss_feeds_clean)
+    return list(set(rss_feeds_clean)), exclude
+
+def _get_blog_links(blog_links, basedomain, exclude):
+    blog_links_raw = list(blog_links)
     blog_links_clean =_clean_links(blog_links_raw, basedomain)
     blog_links_clean = _remove_prefixes(blog_links_clean)
     blog_links_clean = [_truncate_url(url, ['blog', 'post', 'article'])
                         for url in blog_links_clean]
     blog_links_clean = [x for x in blog_links_clean if x not in exclude]
-    exclude = exclude + blog_links_raw + blog_links_clean
-    return list(set(blog_links_clean)), list(set(exclude))
-
-def _get_email_links(soup, exclude):
-    email_patterns = ['mailto:']
-    email_links = []
-    for pattern in email_patterns:
-        email_links += soup.find_all(
-            'a', href=lambda x: x and re.search(pattern, x) is not None)
-    email_links_raw = [x.get('href') for x in email_links]
+    exclude = exclude.union(blog_links_raw, blog_links_clean)
+    return list(set(blog_links_clean)), exclude
+
+def _get_email_links(email_links, exclude):
+    email_links_raw = list(email_links)
     email_links_clean = [x.replace('mailto:', '') for x in email_links_raw]
     email_links_clean = [x for x in email_links_clean if x not in exclude]
-    exclude = exclude + email_links_raw + email_links_clean
-    return list(set(email_links_clean)), list(set(exclude))
+    exclude = exclude.union(email_links_raw, email_links_clean)
+    return list(set(email_links_clean)), exclude
 
-def _get_other_links(soup, basedomain, basedomain_list, exclude):
+def _get_other_links(links, basedomain, basedomain_list, exclude):
     """
-    Extracts and categorizes links from a BeautifulSoup object into internal, subdomain, and external links.
+    Categorizes the hrefs of a page's <a> tags into internal, subdomain, and external links.
     
     Args:
-        soup (BeautifulSoup): Parsed HTML content
+        links (list): Raw hrefs of every <a> tag on the page
         basedomain (str): Primary domain of the page being processed
         basedomain_list (list): List of domains considered "internal"
-        exclude (list): List of URLs to exclude from results
+        exclude (set): URLs to exclude from results
         
     Returns:
         tuple: (internal_urls, subdomain_urls, external_urls) containing lists of categorized URLs
     """
-    a_tags = soup.find_all('a')
-    links = [x.get('href') for x in a_tags]
     links = [x for x in links if x not in exclude]
     links = _clean_links(links, basedomain)
     links = [x for x in links if x not in exclude]
 
+    # the links are canonical, so the page's own domains are compared by
+    # their keys too: case, default ports, scheme and www. do not matter
+    basedomain_list = [canonicalize(x) for x in basedomain_list if x]
+    own_keys = {url_key(x) for x in basedomain_list}
+    own_prefixes = tuple(key + sep for key in own_keys for sep in ('/', '?'))
+
     # get internal links
-    int_urls = []
-    for bd in basedomain_list:
-        int_urls += [x for x in links if x.startswith(bd)]
-    int_urls = list(set(int_urls + basedomain_list))
+    int_urls = {
+        x for x in links
+        if (url_key(x) in own_keys) or url_key(x).startswith(own_prefixes)}
+    int_urls.update(basedomain_list)
 
     links = [x for x in links if x not in int_urls]
-    # find links to subdomains
-    sub_urls = [x for x in links 
-                if tldextract.extract(x).domain == \
-                    tldextract.extract(basedomain).domain]
+    # find links to subdomains, decomposing the page's own domain only once
+    domain = extract_domain(canonicalize(basedomain)).domain
+    sub_urls = {x for x in links if extract_domain(x).domain == domain}
     # external links
-    ext_urls = [x for x in links if x not in sub_urls + int_urls]
-    return list(set(int_urls)), list(set(sub_urls)), list(set(ext_urls))
+    ext_urls = {x for x in links if x not in sub_urls}
+    return list(int_urls), list(sub_urls), list(ext_urls)
+
+# non-breaking/zero-width spaces, bullets, pipes, tabs and newlines become
+# spaces, stray encoding debris is dropped
+_CLEAN_TABLE = str.maketrans({
+    '\xa0': ' ', '\u200b': ' ', '\u200c': ' ', '\u2022': ' ', '|': ' ', '\n': ' ', '\t': ' ',
+    '\xc2': None, '\xa9': None, '\xd7': None,
+    })
+_MULTI_SPACE = re.compile(' +')
+# full stops and commas are not preceded by a space
+_SPACE_PUNCT = re.compile(' ([.,])')
+# separates the fragments of a batch while they are cleaned together
+_SEP = '\x1e'
 
 def _clean_text(text):
-    # replace non-breaking space and zero-width space with regular space
-    for char in ['\xa0', '\u200b', '\u200c']:
-        text = text.replace(char, ' ')
-    # replace • and | symbols with spaces
-    text = text.replace('•', ' ').replace('|', ' ')
-    # remove these weird characters
-    text = text.replace('â', '') \
-        .replace('Â', '').replace('©', '') \
-        .replace('×', '').replace(' // ', ' ') \
-    # remove tabs and newlines
-    text = text.replace('\n', ' ').replace('\t', ' ')
-    # ensure full stops and commas are not preceded by a space
-    text = text.replace(' .', '.').replace(' ,', ',')
+    return _clean_texts([text])[0]
+
+def _clean_texts(texts):
+    '''
+    Clean a batch of text fragments.
+
+    The fragments are joined and pass through the translate table and each
+    regex once, then split apart again; every fragment comes back stripped
+    and ending with a full stop, question mark or exclamation mark.
+    '''
+    if not texts:
+        return []
+    text = _SEP.join(texts)
+    if text.count(_SEP) != len(texts) - 1:
+        # a fragment contains the separator itself
+        return [_clean_text(x.replace(_SEP, ' ')) for x in texts]
+    # the mis-decoded UTF-8 prefix is two characters, too long for the table
+    text = text.replace('\xe2\x80', '').translate(_CLEAN_TABLE).replace(' // ', ' ')
     # remove any multiple full stops or commas
     text = text.replace('.+', '.').replace(',+', ',')
     # remove all excess whitespace
-    text = re.sub(' +', ' ', text)
-    # remove any whitespace at the beginning or end of the string
-    text = text.strip()
-    # add a full-stop if the text does not end with a full-stop, question mark, or exclamation mark
-    if not text.endswith(('.', '?', '!')):
-        text += '.'
-    return text
+    text = _SPACE_PUNCT.sub(r'\1', _MULTI_SPACE.sub(' ', text))
+    cleaned = []
+    for x in text.split(_SEP):
+        x = x.strip()
+        if not x.endswith(('.', '?', '!')):
+            x += '.'
+        cleaned.append(x)
+    return cleaned
 
 def _remove_prefixes(lst):
-    result = []
-    for s1 in lst:
-        if not any(s1.startswith(s2) for s2 in lst if s1 != s2):
-            result.append(s1)
-    return result
+    # drop every string that has another string in the list as a prefix.
+    # in sorted order a string's shortest prefix is always the most recently
+    # kept string, so one comparison per string is enough
+    kept = set()
+    last = None
+    for s in sorted(set(lst)):
+        if (last is not None) and s.startswith(last):
+            continue
+        kept.add(s)
+        last = s
+    return [s for s in lst if s in kept]
 
 def _truncate_url(url, words):
     parsed = urlparse(url)
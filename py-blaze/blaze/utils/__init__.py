@@ -1 +1,3 @@
-from .tools import *
\ No newline at end of file
+from .tools import *
+from .canonical import *
+from .dates import *
@@ -0,0 +1,144 @@
+'''Canonical urls and the keys used to dedupe them.'''
+import functools
+import re
+from urllib.parse import urlsplit, urlunsplit
+import numpy as np
+import pandas as pd
+
+# query parameters that only record where a click came from
+_TRACKING_PREFIXES = ('utm_',)
+_TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_hsenc', '_hsmi', 'mkt_tok', 'ref_src', 's_cid',
+    ])
+_DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+_MULTI_SLASH = re.compile('/{2,}')
+# lower-case http(s) host, a path without repeated slashes or whitespace, no
+# query or fragment: most links are already canonical and skip urlsplit entirely
+_CANONICAL = re.compile(r'https?://[a-z0-9.\-]+/(?:[^/?#\s]+/)*[^/?#\s]*\Z')
+
+
+def absolute_url(href, base):
+    '''
+    Resolve an href found on a page against the page's base domain.
+
+    Hrefs starting with www. or // get https, hrefs starting with / are
+    relative to the base and anything else not starting with http is
+    treated as a path below the base.
+    '''
+    if href.startswith('www.'):
+        return 'https://' + href
+    if href.startswith('//'):
+        return 'https:' + href
+    base = base[:-1] if base.endswith('/') else base
+    if href.startswith('/'):
+        return base + href
+    if not href.startswith('http'):
+        return base + '/' + href
+    return href
+
+
+@functools.lru_cache(maxsize=2**16)
+def canonicalize(url):
+    '''
+    The canonical form of a http(s) url.
+
+    Scheme and host are lower-cased, default ports, fragments and tracking
+    parameters (utm_*, fbclid, ...) are dropped and repeated slashes in the
+    path are collapsed; an empty path becomes /. Other urls are returned
+    unchanged.
+    '''
+    if _CANONICAL.match(url):
+        return url
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS:
+        return url
+    netloc = parts.netloc.lower()
+    if netloc.endswith(_DEFAULT_PORTS[scheme]):
+        netloc = netloc[:-len(_DEFAULT_PORTS[scheme])]
+    path = _MULTI_SLASH.sub('/', parts.path) or '/'
+    query = '&'.join(
+        param for param in parts.query.split('&')
+        if param and not _is_tracking(param.partition('=')[0]))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+@functools.lru_cache(maxsize=2**16)
+def url_key(url):
+    '''
+    Dedupe key of a url: the canonical url without its scheme, a leading
+    www. or a trailing slash, so http/https and www/bare variants of the
+    same page share one key.
+    '''
+    url = canonicalize(url)
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return url
+    if rest.startswith('www.'):
+        rest = rest[4:]
+    path, sep, query = rest.partition('?')
+    return path.rstrip('/') + sep + query
+
+
+def url_variants(url):
+    '''
+    The url and the common spellings that share its key: http and https,
+    with and without www. and a trailing slash.
+    '''
+    key = url_key(url)
+    path, sep, query = key.partition('?')
+    if '://' in canonicalize(url):
+        hosts = [path, 'www.' + path]
+        spellings = [
+            f'{scheme}://{host}{slash}{sep}{query}'
+            for scheme in ('https', 'http') for host in hosts for slash in ('', '/')]
+    else:
+        spellings = []
+    return list(dict.fromkeys([url] + spellings))
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name.startswith(_TRACKING_PREFIXES) or (name in _TRACKING_PARAMS)
+
+
+def _map_unique(fn, urls):
+    # each distinct url is processed once and broadcast back, missing values map to None
+    urls = pd.Series(urls, dtype=object)
+    codes, uniques = pd.factorize(urls)
+    mapped = np.array([fn(u) for u in uniques] + [None], dtype=object)
+    return pd.Series(mapped[codes], index=urls.index, name=urls.name)
+
+
+def canonicalize_urls(urls, base=None):
+    '''
+    Vectorized canonicalize for a whole pandas column.
+
+    Args:
+        urls (pd.Series or list): urls, or hrefs when base is given
+        base (str, optional): Base domain relative hrefs are resolved against
+
+    Returns:
+        pd.Series: canonical urls, aligned with the input
+    '''
+    if base is None:
+        return _map_unique(canonicalize, urls)
+    return _map_unique(lambda href: canonicalize(absolute_url(href, base)), urls)
+
+
+def url_keys(urls):
+    '''Vectorized url_key, aligned with the input.'''
+    return _map_unique(url_key, urls)
+
+
+def dedupe_urls(urls):
+    '''The first url of every key, in their original order.'''
+    first = {}
+    for url in urls:
+        first.setdefault(url_key(url), url)
+    return list(first.values())
@@ -0,0 +1,120 @@
+'''Fast parsing of feed dates.'''
+import re
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
+
+# Mon, 06 Sep 2021 16:45:00 GMT, with or without the weekday, seconds or zone.
+# Both patterns must match the whole string: anything more (AM/PM, 'at 10:00')
+# is left to dateutil
+_RFC822 = re.compile(
+    r'\s*(?:[A-Za-z]{3,9},?\s+)?(\d{1,2})\s+([A-Za-z]{3})[A-Za-z]*\.?,?\s+'
+    r'(\d{4}|\d{2})(?:\s+(\d{1,2}):(\d{2})(?::(\d{2}))?)?'
+    r'(?:\s*(?:[+-]\d{2}:?\d{2}|(?!AM\b|PM\b)[A-Z]{1,5}))?\s*\Z')
+# 2021-09-06T16:45:00.123+01:00, 2021-09-06 16:45 or 2021/09/06
+_ISO8601 = re.compile(
+    r'\s*(\d{4})[-/](\d{2})[-/](\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d{1,6}))?)?)?'
+    r'(?:\s*(?:Z|[+-]\d{2}(?::?\d{2})?))?\s*\Z')
+_MONTHS = {
+    m: i for i, m in enumerate(
+        ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+
+def _from_rfc822(value):
+    match = _RFC822.match(value)
+    if match is None:
+        return None
+    day, month, year, hour, minute, second = match.groups()
+    year = int(year)
+    if year < 100:
+        year = _full_year(year)
+    return datetime(
+        year, _MONTHS.get(month.lower()), int(day),
+        int(hour or 0), int(minute or 0), int(second or 0))
+
+
+def _from_iso8601(value):
+    match = _ISO8601.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction = match.groups()
+    return datetime(
+        int(year), int(month), int(day),
+        int(hour or 0), int(minute or 0), int(second or 0),
+        int(fraction.ljust(6, '0')) if fraction else 0)
+
+
+def _full_year(year):
+    # dateutil's rule: the year within 50 years of the current one
+    this_year = datetime.now().year
+    year += this_year - this_year % 100
+    if year >= this_year + 50:
+        year -= 100
+    elif year < this_year - 50:
+        year += 100
+    return year
+
+
+_PARSERS = {'rfc822': _from_rfc822, 'iso8601': _from_iso8601}
+
+# key (e.g. a feed url) -> the fast path that parsed its last date
+_formats = {}
+
+
+def parse_date(value, key=None):
+    '''
+    Parse one date string like dateutil's parse(ignoretz=True).
+
+    RFC 822 and ISO 8601 dates are parsed with precompiled patterns; the time
+    zone is dropped, not converted, so the wall-clock time is kept. Other
+    dates go to dateutil. With a key, the fast path that worked is
+    remembered and tried first for the next date with the same key.
+
+    Returns:
+        datetime, or None if the value cannot be parsed
+    '''
+    if not isinstance(value, str):
+        return None
+    names = list(_PARSERS)
+    if _formats.get(key, names[0]) != names[0]:
+        names.reverse()
+    for name in names:
+        try:
+            parsed = _PARSERS[name](value)
+        except (TypeError, ValueError, OverflowError):
+            # matches the pattern but is not a valid date
+            parsed = None
+        if parsed is not None:
+            if key is not None:
+                _formats[key] = name
+            return parsed
+    try:
+        return parse(value, ignoretz=True)
+    except (ValueError, OverflowError):
+        return None
+
+
+def parse_dates(values, key=None):
+    '''
+    Vectorized parse_date for a whole pandas column.
+
+    Each distinct value is parsed once and the results are broadcast back.
+
+    Args:
+        values (pd.Series or list): Date strings
+        key (str, optional): Where the dates come from, e.g. the feed url
+
+    Returns:
+        pd.Series: datetime64 values aligned with the input, NaT where a
+            value could not be parsed
+    '''
+    values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    # code -1 (missing) picks up the trailing NaT
+    parsed = pd.to_datetime(
+        pd.Series([parse_date(u, key) for u in uniques] + [None], dtype=object),
+        errors='coerce')
+    return pd.Series(
+        np.asarray(parsed, dtype='datetime64[ns]')[codes], index=values.index, name=values.name)
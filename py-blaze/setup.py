@@ -9,19 +9,23 @@ setup(
         'backoff>=2.2.1',
         'beautifulsoup4>=4.12.2',
         'feedparser==6.0.10',
+        'httpx[http2,brotli]>=0.27.0',
         'joblib>=1.2.0',
         'listparser==0.19',
+        'lxml>=4.9.3',
         'markdown==3.4.3',
         'numpy>=1.25.1',
         'openai>=1.6.1',
         'pandas>=2.2.2',
         'pinecone-client==4.0.0',
         'psycopg2-binary==2.9.9',
+        'pyarrow>=14.0.1',
         'pydantic>=2.6.1',
         'python_dateutil>=2.8.2',
         'pytz==2023.3',
         'requests>=2.31.0',
         'scikit-learn==1.3.0',
+        'selectolax>=0.3.21',
         'selenium==4.11.2',
         'SQLAlchemy==2.0.24',
         'tiktoken==0.4.0',
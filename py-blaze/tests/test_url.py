@@ -0,0 +1,23 @@
+import os
+
+# blaze.data reads its connection settings at import
+for name in ['PG_HOST', 'PG_PORT', 'PG_USERNAME', 'PG_PASSWORD', 'PG_DATABASE']:
+    os.environ.setdefault(name, '')
+
+from blaze.scraping.url import _get_other_links
+
+
+def test_mixed_case_host_links_are_internal():
+    base = 'https://Example.com/'
+    links = ['/x', 'https://EXAMPLE.com:443/y', 'https://blog.example.com/a', 'https://other.com/b']
+    int_urls, sub_urls, ext_urls = _get_other_links(links, base, [base], set())
+    assert set(int_urls) == {'https://example.com/', 'https://example.com/x', 'https://example.com/y'}
+    assert sub_urls == ['https://blog.example.com/a']
+    assert ext_urls == ['https://other.com/b']
+
+
+def test_lookalike_host_is_external():
+    base = 'https://example.com/'
+    int_urls, _, ext_urls = _get_other_links(['https://example.com.evil.com/c'], base, [base], set())
+    assert int_urls == ['https://example.com/']
+    assert ext_urls == ['https://example.com.evil.com/c']
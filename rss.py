@@ -1,7 +1,12 @@
+import re
+import time
+from datetime import timedelta
+import concurrent.futures
 import pandas as pd
-from dateutil.parser import parse
 from ..data.postgres import url_in_table, PG
-from ..scraping import read_rss, CorpusReader, get_basedomain
+from ..scraping import read_rss, CorpusReader, get_basedomain, basedomain
+from ..utils.canonical import canonicalize_urls, url_keys
+from ..utils.dates import parse_dates
 from ..ai.llm import llm_completion
 from catboost import CatBoostClassifier, Pool
 from sklearn.model_selection import train_test_split
@@ -64,7 +69,8 @@ class DescribeRSS():
     def _read_feed(self):
         # read the rss feed
         try:
-            self.posts = RecentPosts([self.rss], timeout=30)
+            # the latest 100 posts are enough for the posting interval stats
+            self.posts = RecentPosts([self.rss], timeout=30, max_entries=100, max_age=None)
             self.posts.read_feeds()
         except:
             self.posts = None
@@ -87,7 +93,7 @@ class DescribeRSS():
             self.post_latest = str(items.dt_published.max())
             self.posts_10 = self.posts.all_items.head(10)
             # get the most common base domain
-            bd = self.posts_10.link.apply(get_basedomain)
+            bd = basedomain(self.posts_10.link)
             self.baseurl = [bd.value_counts().index[0]]
     
     def _content_extract(self):
@@ -269,6 +275,10 @@ def _ave_page_length(url_list):
         return int(ave_length)
     
 
+_MISSING = object()
+# dates in post urls, in order of preference
+_URL_DATES = [re.compile(r'(\d{4}-\d{2}-\d{2})'), re.compile(r'(\d{4}/\d{2}/\d{2})')]
+
 class FeedReader():
     '''
     Class to read an RSS feed and extract relevant information from the feed entries.
@@ -276,40 +286,58 @@ class FeedReader():
     Args:
         rss_feed (str): The URL of the RSS feed to read.
         timeout (int): The number of seconds to wait for the server to respond.
+        cache (ResponseCache, optional): Validator cache; an unchanged feed is skipped without parsing.
+        state (FeedState, optional): High-water marks; only entries not seen on an earlier read are parsed.
+        max_entries (int, optional): Read at most this many entries, streaming the feed.
+        max_age (timedelta, optional): Stop reading at entries older than this, streaming the feed.
     
     Returns:
         FeedReader: An instance of the FeedReader class.
     '''
 
-    def __init__(self, rss_feed: str, timeout: int = 15):
+    def __init__(self, rss_feed: str, timeout: int = 15, cache=None, state=None, max_entries=None, max_age=None):
         self.rss_feed = rss_feed
         self.timeout = timeout
+        self.cache = cache
+        self.state = state
+        self.max_entries = max_entries
+        self.max_age = max_age
         self.feed = None
         self.feed_df = None
+        self.error = None
+        self.seconds = None
 
     def read(self):
+        start = time.perf_counter()
         try:
             print(f'Try reading RSS: {self.rss_feed}')
-            self.feed = read_rss(self.rss_feed, timeout=self.timeout)
+            self.feed = read_rss(
+                self.rss_feed, timeout=self.timeout, cache=self.cache,
+                max_entries=self.max_entries, max_age=self.max_age)
             self.feed_to_pd()
         except Exception as e:
             print('Error reading feed:', self.rss_feed, e)
+            self.error = e
+        self.seconds = time.perf_counter() - start
         self.summary()
         return self
 
     def feed_to_pd(self):
         # Extract relevant information from the feed entries
-        data = []
-        for entry in self.feed.entries:
-            data.append({
-                'title': _key_get(entry, 'title'),
-                'link': _key_get(entry, 'link'),
-                'author': _key_get(entry, 'author'),
-                'published': _key_get(entry, 'published') or _key_get(entry, 'updated') or _key_get(entry, 'submitted') or '',
-                'summary': _key_get(entry, 'summary'),
-            })
+        entries = self.feed.entries
+        if self.state is not None:
+            # skip the entries seen on an earlier poll
+            entries = self.state.new_entries(self.rss_feed, entries)
+        columns = _entry_columns(entries, ['title', 'link', 'author', 'published', 'summary'])
+        # entries without a published date fall back to updated, then submitted
+        undated = [i for i, published in enumerate(columns['published']) if not published]
+        if undated:
+            fallback = _entry_columns([entries[i] for i in undated], ['updated', 'submitted'])
+            for i, updated, submitted in zip(undated, fallback['updated'], fallback['submitted']):
+                columns['published'][i] = updated or submitted or ''
         # Create a Pandas DataFrame from the extracted data
-        self.feed_df = pd.DataFrame(data)
+        self.feed_df = pd.DataFrame(
+            columns, columns=['title', 'link', 'author', 'published', 'summary'], dtype=object)
 
         # ensure title, link, author and summary columns are all strings
         self.feed_df['title'] = self.feed_df.title.astype(str)
@@ -318,29 +346,26 @@ class FeedReader():
 
         #  if dates are all null, attempt to extract dates from url
         if (self.feed_df.published == '').all():
-            # look for date pattern 'YYYY-mm-dd' in the url
-            ptrn_1 = self.feed_df.link.str.extract(r'(\d{4}-\d{2}-\d{2})')
-            if not ptrn_1.isnull().all()[0]:
-                self.feed_df['published'] = ptrn_1
-            else:
-                # look for date pattern 'YYYY/mm/dd' in the url
-                ptrn_2 = self.feed_df.link.str.extract(r'(\d{4}/\d{2}/\d{2})')
-                if not ptrn_2.isnull().all()[0]:
-                    self.feed_df['published'] = ptrn_2
-
-        # convert published dates to datetime
+            # look for date pattern 'YYYY-mm-dd', then 'YYYY/mm/dd' in the url
+            for pattern in _URL_DATES:
+                url_dates = self.feed_df.link.str.extract(pattern, expand=False)
+                if url_dates.notnull().any():
+                    self.feed_df['published'] = url_dates
+                    break
+
+        # convert published dates to datetime, the feed's date format is remembered
         self.feed_df = self.feed_df \
             .assign(rss=self.rss_feed) \
-            .assign(dt_published = lambda x: x.published.apply(_convert_to_date)) 
-        # print(self.feed_df)
-        # if any of the entries do not start with http, add the domain
-        self.feed_df['link'] = self.feed_df \
-            .link.apply(lambda x: x if x.startswith('http') else get_basedomain(self.rss_feed) + x)
-        # rmeove instances of '//' not immediately after ':'
-        self.feed_df['link'] = self.feed_df.link \
-            .apply(lambda x: x.replace('://', '|||')) \
-            .apply(lambda x: x.replace('//', '/')) \
-            .apply(lambda x: x.replace('|||', '://'))
+            .assign(dt_published = lambda x: parse_dates(x.published, key=self.rss_feed))
+        if self.state is not None:
+            # new ids are kept whatever their date: backdated posts, and dates
+            # whose zone was dropped, can sort before the newest seen.
+            # Pending until RecentPosts.commit_state()
+            self.state.update(self.rss_feed, self.feed.entries, self.feed_df.dt_published.max())
+        # resolve relative links against the feed's domain and canonicalize,
+        # which also collapses '//' in the path
+        self.feed_df['link'] = canonicalize_urls(
+            self.feed_df.link, base=get_basedomain(self.rss_feed))
 
     def summary(self):
         try:
@@ -357,18 +382,31 @@ class RecentPosts():
     Args:
         rss_feeds (list): A list of RSS feed URLs to read.
         days (int): The number of days to consider as 'recent'.
-        **kwargs: Additional keyword arguments to pass to the FeedReader class.
+        check_existing (bool): Drop articles that are already in blaze_content.
+        known (KnownURLIndex, optional): Local index used for check_existing instead of a database query.
+        workers (int): Number of feeds read concurrently.
+        deadline (float, optional): Seconds allowed for reading all feeds, feeds
+            still being read after it are recorded as timed out and left out.
+        state (FeedState, optional): Per-feed high-water marks, committed by commit_state()
+            once the recent items have been stored.
+        **kwargs: Additional keyword arguments to pass to the FeedReader class;
+            max_age defaults to days, so feeds are only read back that far.
     
     Returns:
         RecentPosts: An instance of the RecentPosts class.
 
     '''
-    def __init__(self, rss_feeds, days=14, check_existing=True, **kwargs):
+    def __init__(self, rss_feeds, days=14, check_existing=True, known=None, workers=16, deadline=None, state=None, **kwargs):
         self.rss_feeds = rss_feeds
         self.days = days
         self.check_existing = check_existing
-        self.kwargs = kwargs
+        self.known = known
+        self.workers = workers
+        self.deadline = deadline
+        self.state = state
+        self.kwargs = {'max_age': timedelta(days=days), **kwargs}
         self.feed_list = []
+        self.feed_status = None
 
     def run(self):
         self.read_feeds()
@@ -376,15 +414,36 @@ class RecentPosts():
         return self
 
     def read_feeds(self):
-        # read each RSS feed
-        for feed in self.rss_feeds:
-            self.feed_list.append(
-                FeedReader(feed, **self.kwargs).read().feed_df)
+        # read the RSS feeds concurrently, total time is bounded by the deadline
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        futures = {
+            executor.submit(FeedReader(feed, state=self.state, **self.kwargs).read): feed
+            for feed in self.rss_feeds}
+        readers = {}
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=self.deadline):
+                readers[futures[future]] = future.result()
+        except concurrent.futures.TimeoutError:
+            print(f'Feed deadline of {self.deadline}s reached, {len(futures) - len(readers)} feeds not read')
+        finally:
+            # feeds in progress finish in the background, bounded by their own timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.feed_status = pd.DataFrame(
+            [_feed_status(feed, readers.get(feed)) for feed in self.rss_feeds],
+            columns=['rss', 'status', 'entries', 'items', 'seconds', 'error'])
+        # frames of the feeds that were read, in feed order
+        self.feed_list = [
+            readers[feed].feed_df for feed in self.rss_feeds
+            if (feed in readers) and (readers[feed].feed_df is not None)]
+        if not self.feed_list:
+            self.feed_list = [pd.DataFrame(
+                columns=['title', 'link', 'author', 'published', 'summary', 'rss']) \
+                .assign(dt_published = pd.Series(dtype='datetime64[ns]'))]
         # lightly clean the data
         self.all_items = pd.concat(self.feed_list) \
             .dropna(subset=['link', 'published']) \
-            .drop_duplicates('link') \
-            .assign(date = lambda x: pd.to_datetime(x.dt_published, errors='coerce').dt.date)
+            .loc[lambda x: ~url_keys(x.link).duplicated().to_numpy()] \
+            .assign(date = lambda x: x.dt_published.dt.date)
     
     def get_recent_posts(self):
         # get all articles from the last X days
@@ -409,7 +468,9 @@ class RecentPosts():
         print(f'\nFound {num_articles} articles from {len(self.all_items.rss.unique().tolist())} feeds in the last {self.days} days.')
         if num_articles > 0:
             unresolved_urls = recent_items.link.tolist()
-            if self.check_existing:
+            if self.check_existing and (self.known is not None):
+                urls_existing = self.known.known(unresolved_urls)
+            elif self.check_existing:
                 urls_existing = url_in_table(unresolved_urls, 'blaze_content')
             else:
                 urls_existing = []
@@ -428,34 +489,59 @@ class RecentPosts():
             .assign(dt_fetched = lambda x: pd.to_datetime('now', format='%Y-%m-%d %H:%M:%S'))
         return self
 
-def _convert_to_date(date_string):
-    try:
-        return parse(date_string, ignoretz=True)
-    except ValueError:
-        # print(f"Cannot parse date string {date_string}")
-        return None
-    
-def _key_get(dictionary: dict, pkey: str):
+    def commit_state(self):
+        '''
+        Commit the feeds' high-water marks, call once recent_items are stored.
+        Only feeds read in full by read_feeds are committed: feeds dropped by
+        the volume filter, or still being read at the deadline, have their
+        entries offered again by the next poll.
+        '''
+        if self.state is None:
+            return self
+        dropped = set(self.all_recent_items.rss) - set(self.feed_volume_filter)
+        read = self.feed_status.rss[self.feed_status.status == 'ok']
+        self.state.commit([feed for feed in read if feed not in dropped])
+        return self
+
+def _feed_status(feed, reader):
+    # one row of RecentPosts.feed_status
+    if reader is None:
+        return (feed, 'timeout', None, None, None, None)
+    entries = len(reader.feed.entries) if reader.feed is not None else None
+    items = len(reader.feed_df) if reader.feed_df is not None else None
+    if reader.error is not None:
+        return (feed, 'error', entries, items, reader.seconds, str(reader.error))
+    return (feed, 'ok', entries, items, reader.seconds, None)
+
+def _entry_columns(entries, fields):
     """
-    Custom function to perform partial key matching in a dictionary using .get() method.
-    
+    Feed entry fields, column by column. A field missing or empty in an
+    entry falls back to the first key containing the field name; those keys
+    are resolved once per feed instead of scanning every entry's keys.
+
     Args:
-        dictionary (dict): The dictionary to search.
-        partial_key (str): The partial key to match.
-        
+        entries (list): Feed entries
+        fields (list): Field names, matched exactly or as part of a key
+
     Returns:
-        The value corresponding to the matched key, or None if no match is found.
+        dict: field -> list of values, one per entry
     """
-    # first check if the key is in the dictionary
-    vl = dictionary.get(pkey)
-    if vl:
-        return vl
-    
-    # Iterate over keys in the dictionary
-    for key in dictionary.keys():
-        # Check if the partial key is a substring of the current key
-        if pkey in key:
-            # Return the value corresponding to the matched key
-            return dictionary.get(key)
-    # If no match is found, return None
-    return None
\ No newline at end of file
+    keys = list(dict.fromkeys(key for entry in entries for key in entry.keys()))
+    # plain dict lookups, FeedParserDict.get also resolves legacy aliases on every call
+    get = dict.get
+    columns = {}
+    for field in fields:
+        fallbacks = [key for key in keys if field in key]
+        values = []
+        for entry in entries:
+            value = get(entry, field)
+            if not value:
+                for key in fallbacks:
+                    value = get(entry, key, _MISSING)
+                    if value is not _MISSING:
+                        break
+                else:
+                    value = None
+            values.append(value)
+        columns[field] = values
+    return columns